@@ -0,0 +1 @@
+"""Throughput benchmarks: synthetic WAV corpora and a local Google API stand-in."""
@@ -0,0 +1,96 @@
+import math
+import os
+import random
+import wave
+from array import array
+
+# Each profile is a list of file groups: how many files, how long, and their format
+CORPUS_PROFILES = {
+    'short': [
+        {'count': 200, 'seconds': 30, 'sample_rate': 44100, 'channels': 2},
+    ],
+    'long': [
+        {'count': 3, 'seconds': 3 * 3600, 'sample_rate': 48000, 'channels': 2},
+    ],
+    'mixed': [
+        {'count': 40, 'seconds': 45, 'sample_rate': 22050, 'channels': 1},
+        {'count': 40, 'seconds': 120, 'sample_rate': 44100, 'channels': 2},
+        {'count': 10, 'seconds': 600, 'sample_rate': 48000, 'channels': 2},
+        {'count': 2, 'seconds': 2 * 3600, 'sample_rate': 44100, 'channels': 2},
+        {'count': 2, 'seconds': 900, 'sample_rate': 96000, 'channels': 2},
+    ],
+}
+
+
+def synthesize_block(sample_rate, channels, seed):
+    """Return one second of 16-bit PCM: a few tones plus noise, deterministic per seed."""
+    rng = random.Random(seed)
+    tones = [rng.uniform(110, 880) for _ in range(3)]
+    samples = array('h')
+    for n in range(sample_rate):
+        t = n / sample_rate
+        value = sum(math.sin(2 * math.pi * f * t) for f in tones) / len(tones)
+        value = 0.5 * value + 0.05 * rng.uniform(-1, 1)
+        sample = int(value * 32767)
+        for _ in range(channels):
+            samples.append(sample)
+    return samples.tobytes()
+
+
+def generate_wav(file_path, seconds, sample_rate=44100, channels=2, silence=0.0, seed=0):
+    """Write a synthetic 16-bit WAV file of the given length.
+
+    Args:
+        file_path: Where to write the file
+        seconds: Length of the programme material in seconds
+        sample_rate: Sample rate in Hz
+        channels: Number of channels
+        silence: Seconds of digital silence added at the head and the tail
+        seed: Seed for the synthesized content, so corpora are reproducible
+    """
+    block = synthesize_block(sample_rate, channels, seed)
+    silent_second = bytes(len(block))
+    frame_bytes = 2 * channels
+
+    def write_seconds(wav, data, duration):
+        whole, fraction = divmod(duration, 1)
+        for _ in range(int(whole)):
+            wav.writeframesraw(data)
+        partial = int(fraction * sample_rate) * frame_bytes
+        if partial:
+            wav.writeframesraw(data[:partial])
+
+    with wave.open(file_path, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        write_seconds(wav, silent_second, silence)
+        write_seconds(wav, block, seconds)
+        write_seconds(wav, silent_second, silence)
+
+
+def generate_corpus(output_dir, profile='mixed', scale=1.0, silence=0.0, seed=0):
+    """Generate (or reuse) a synthetic WAV corpus and return the file paths.
+
+    `scale` multiplies every duration, so the multi-hour profiles can be shrunk
+    for quick runs. Files that already exist with the expected size are reused.
+    """
+    if profile not in CORPUS_PROFILES:
+        raise ValueError(f"Unknown corpus profile: {profile}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for group_index, group in enumerate(CORPUS_PROFILES[profile]):
+        seconds = max(group['seconds'] * scale, 1.0)
+        for i in range(group['count']):
+            name = f"{profile}_{group['sample_rate']}hz_{group['channels']}ch_{group_index:02d}_{i:04d}.wav"
+            path = os.path.join(output_dir, name)
+            frames = (int(seconds) + 2 * int(silence)) * group['sample_rate'] \
+                + int((seconds % 1) * group['sample_rate']) \
+                + 2 * int((silence % 1) * group['sample_rate'])
+            expected_size = 44 + frames * 2 * group['channels']
+            if not os.path.exists(path) or os.path.getsize(path) != expected_size:
+                generate_wav(path, seconds, group['sample_rate'], group['channels'],
+                             silence=silence, seed=seed + group_index * 1000 + i)
+            paths.append(path)
+    return paths
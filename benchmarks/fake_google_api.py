@@ -0,0 +1,301 @@
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse, urlunparse
+
+# Size of the pieces request bodies are read in when bandwidth is limited
+READ_BLOCK_SIZE = 64 * 1024
+
+
+def column_index(letters):
+    """Convert a column name such as 'A' or 'AB' to a zero-based index."""
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + (ord(letter) - ord('A') + 1)
+    return index - 1
+
+
+def parse_a1_range(range_name):
+    """Split an A1 range such as 'Sheet1!B4:C' into (sheet, first_row, first_col, last_col).
+
+    Rows are one-based; a missing row means row 1 and a missing end column means
+    "to the end of the row".
+    """
+    sheet, _, cells = range_name.rpartition('!')
+    start, _, end = cells.partition(':')
+    start_match = re.match(r'([A-Za-z]*)(\d*)', start)
+    end_match = re.match(r'([A-Za-z]*)(\d*)', end)
+    first_col = column_index(start_match.group(1)) if start_match.group(1) else 0
+    first_row = int(start_match.group(2)) if start_match.group(2) else 1
+    last_col = column_index(end_match.group(1)) if end_match.group(1) else None
+    return sheet.strip("'"), first_row, first_col, last_col
+
+
+class FakeGoogleApi:
+    """Local HTTP stand-in for the Drive resumable-upload and Sheets values endpoints.
+
+    Args:
+        latency: Seconds added before every response
+        bandwidth: Upload bandwidth limit in bytes per second (None for unlimited)
+        error_rate: Probability of answering a request with 503
+        seed: Seed for error injection, so runs are reproducible
+    """
+
+    def __init__(self, latency=0.0, bandwidth=None, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.uploads = {}
+        self.files = {}
+        self.sheets = {}
+        self.stats = {'requests': 0, 'injected_errors': 0, 'bytes_received': 0}
+        self.server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Start serving on a free localhost port and return the base URL."""
+        api = self
+
+        class Handler(FakeGoogleApiHandler):
+            pass
+        Handler.api = api
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        """Stop the server."""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def set_sheet_rows(self, spreadsheet_id, sheet_name, rows):
+        """Replace the contents of a sheet; `rows` starts at row 1."""
+        with self._lock:
+            self.sheets.setdefault(spreadsheet_id, {})[sheet_name] = [list(r) for r in rows]
+
+    def get_sheet_rows(self, spreadsheet_id, sheet_name):
+        """Return a copy of the contents of a sheet."""
+        with self._lock:
+            return [list(r) for r in self.sheets.get(spreadsheet_id, {}).get(sheet_name, [])]
+
+    def next_id(self, prefix):
+        with self._lock:
+            return f"{prefix}{next(self._ids)}"
+
+    def should_fail(self):
+        with self._lock:
+            self.stats['requests'] += 1
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.stats['injected_errors'] += 1
+                return True
+            return False
+
+
+class FakeGoogleApiHandler(BaseHTTPRequestHandler):
+    """Request handler for FakeGoogleApi; `api` is set on a per-server subclass."""
+
+    api = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_body(self):
+        """Read the request body, throttled to the configured bandwidth."""
+        length = int(self.headers.get('Content-Length') or 0)
+        chunks = []
+        remaining = length
+        while remaining > 0:
+            started = time.perf_counter()
+            chunk = self.rfile.read(min(READ_BLOCK_SIZE, remaining))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            remaining -= len(chunk)
+            if self.api.bandwidth:
+                delay = len(chunk) / self.api.bandwidth - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+        with self.api._lock:
+            self.api.stats['bytes_received'] += length - remaining
+        return b''.join(chunks)
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_empty(self, status, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def handle_request(self, method):
+        body = self.read_body()
+        if self.api.latency:
+            time.sleep(self.api.latency)
+        if self.api.should_fail():
+            self.send_json(503, {'error': {'code': 503, 'message': 'Injected error'}})
+            return
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        path = unquote(url.path)
+
+        if path.startswith('/upload/drive/v3/files'):
+            if 'upload_id' in query:
+                self.handle_upload_chunk(query['upload_id'][0], body)
+            else:
+                self.handle_upload_start(body)
+            return
+
+        if path.startswith('/drive/v3/files') and method == 'GET':
+            self.send_json(200, {'files': []})
+            return
+
+        match = re.match(r'/v4/spreadsheets/([^/]+)/values/(.+)$', path)
+        if match:
+            if method == 'GET':
+                self.handle_values_get(match.group(1), match.group(2))
+            elif method == 'PUT':
+                self.handle_values_update(match.group(1), match.group(2), body)
+            else:
+                self.send_json(405, {'error': {'code': 405, 'message': 'Method not allowed'}})
+            return
+
+        self.send_json(404, {'error': {'code': 404, 'message': f'No handler for {path}'}})
+
+    def handle_upload_start(self, body):
+        metadata = json.loads(body or b'{}')
+        upload_id = self.api.next_id('upload-')
+        size = self.headers.get('X-Upload-Content-Length')
+        self.api.uploads[upload_id] = {
+            'metadata': metadata,
+            'size': int(size) if size else None,
+            'received': 0,
+            'file': None,
+        }
+        host = self.headers.get('Host')
+        location = f"http://{host}/upload/drive/v3/files?uploadType=resumable&upload_id={upload_id}"
+        self.send_empty(200, {'Location': location})
+
+    def handle_upload_chunk(self, upload_id, body):
+        upload = self.api.uploads.get(upload_id)
+        if upload is None:
+            self.send_json(404, {'error': {'code': 404, 'message': 'Unknown upload'}})
+            return
+
+        content_range = self.headers.get('Content-Range', '')
+        match = re.match(r'bytes (\*|(\d+)-(\d+))/(\*|\d+)', content_range)
+        if match and match.group(4) != '*':
+            upload['size'] = int(match.group(4))
+        if match and match.group(1) != '*' and int(match.group(2)) == upload['received']:
+            upload['received'] = int(match.group(3)) + 1
+
+        if upload['file'] is None and upload['size'] is not None and upload['received'] >= upload['size']:
+            file_id = self.api.next_id('file-')
+            upload['file'] = {
+                'id': file_id,
+                'name': upload['metadata'].get('name'),
+                'parents': upload['metadata'].get('parents', []),
+                'webViewLink': f"https://drive.google.com/file/d/{file_id}/view",
+                'size': upload['size'],
+            }
+            self.api.files[file_id] = upload['file']
+
+        if upload['file'] is not None:
+            self.send_json(200, {'id': upload['file']['id'], 'webViewLink': upload['file']['webViewLink']})
+        elif upload['received']:
+            self.send_empty(308, {'Range': f"bytes=0-{upload['received'] - 1}"})
+        else:
+            self.send_empty(308)
+
+    def handle_values_get(self, spreadsheet_id, range_name):
+        sheet, first_row, first_col, last_col = parse_a1_range(range_name)
+        rows = self.api.get_sheet_rows(spreadsheet_id, sheet)[first_row - 1:]
+        values = [row[first_col:None if last_col is None else last_col + 1] for row in rows]
+        while values and not any(values[-1]):
+            values.pop()
+        self.send_json(200, {'range': range_name, 'majorDimension': 'ROWS', 'values': values})
+
+    def handle_values_update(self, spreadsheet_id, range_name, body):
+        sheet, first_row, first_col, _ = parse_a1_range(range_name)
+        values = json.loads(body or b'{}').get('values', [])
+        with self.api._lock:
+            rows = self.api.sheets.setdefault(spreadsheet_id, {}).setdefault(sheet, [])
+            for offset, new_row in enumerate(values):
+                index = first_row - 1 + offset
+                while len(rows) <= index:
+                    rows.append([])
+                row = rows[index]
+                while len(row) < first_col + len(new_row):
+                    row.append('')
+                row[first_col:first_col + len(new_row)] = new_row
+        cells = sum(len(r) for r in values)
+        self.send_json(200, {
+            'spreadsheetId': spreadsheet_id,
+            'updatedRange': range_name,
+            'updatedRows': len(values),
+            'updatedCells': cells,
+        })
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_PUT(self):
+        self.handle_request('PUT')
+
+
+def build_local_services(base_url):
+    """Return a GoogleServices instance whose Drive and Sheets clients talk to `base_url`."""
+    import httplib2
+    from googleapiclient.discovery import build
+    from google_services import GoogleServices
+
+    base = urlparse(base_url)
+
+    class LocalHttp(httplib2.Http):
+        """Rewrites every Google API URL to the local server, keeping the path."""
+
+        def request(self, uri, method='GET', body=None, headers=None, *args, **kwargs):
+            uri = urlunparse(urlparse(uri)._replace(scheme=base.scheme, netloc=base.netloc))
+            return super().request(uri, method, body, headers, *args, **kwargs)
+
+    def local_http():
+        http = LocalHttp(timeout=60)
+        # Resumable uploads answer 308 without a Location header; it is not a redirect
+        http.redirect_codes = http.redirect_codes - {308}
+        return http
+
+    drive_service = build('drive', 'v3', http=local_http(),
+                          cache_discovery=False, static_discovery=True)
+    sheets_service = build('sheets', 'v4', http=local_http(),
+                           cache_discovery=False, static_discovery=True)
+    return GoogleServices.from_services(drive_service, sheets_service)
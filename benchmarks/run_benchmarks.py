@@ -0,0 +1,241 @@
+"""End-to-end throughput benchmarks for the conversion and upload pipeline.
+
+Usage (from the repository root):
+
+    python -m benchmarks.run_benchmarks --profile mixed --scale 0.1 --output results.json
+    python -m benchmarks.run_benchmarks --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import CORPUS_PROFILES, generate_corpus
+from benchmarks.fake_google_api import FakeGoogleApi, build_local_services
+from encoder import convert_batch
+from metrics import get_recorder
+from wav_info import get_wav_duration
+
+# Bump when the layout of the results file changes
+RESULTS_SCHEMA_VERSION = 1
+
+
+def summarize_spans(stage):
+    """Aggregate the recorder's unexported spans for one stage."""
+    records = [r for r in get_recorder().records() if r['stage'] == stage]
+    wall = sum(r['wall_seconds'] for r in records)
+    total_bytes = sum(r['bytes'] or 0 for r in records)
+    return {
+        'spans': len(records),
+        'errors': sum(1 for r in records if r['error']),
+        'span_seconds': wall,
+        'bytes': total_bytes,
+        'retries': sum(r['retries'] or 0 for r in records),
+    }
+
+
+def bench_convert(source_files, output_dir):
+    """Time convert_batch over the corpus."""
+    if shutil.which('ffmpeg') is None:
+        return {'skipped': 'ffmpeg not found in PATH'}
+
+    audio_seconds = sum(get_wav_duration(p) or 0 for p in source_files)
+    source_bytes = sum(os.path.getsize(p) for p in source_files)
+    started = time.perf_counter()
+    converted = convert_batch(source_files, output_dir)
+    wall = time.perf_counter() - started
+    return {
+        'files': len(source_files),
+        'converted': len(converted),
+        'wall_seconds': wall,
+        'audio_seconds': audio_seconds,
+        'source_bytes': source_bytes,
+        'output_bytes': sum(os.path.getsize(o) for _, o in converted),
+        'realtime_factor': audio_seconds / wall if wall else None,
+        'files_per_second': len(converted) / wall if wall else None,
+        'spans': summarize_spans('encode'),
+    }
+
+
+def bench_upload(services, files):
+    """Time upload_to_drive for every file against the local server."""
+    uploaded = []
+    total_bytes = sum(os.path.getsize(p) for p in files)
+    started = time.perf_counter()
+    failures = 0
+    for file_path in files:
+        try:
+            file_id, web_link = services.upload_to_drive(file_path, 'benchmark-folder')
+            uploaded.append([os.path.splitext(os.path.basename(file_path))[0], web_link])
+        except Exception:
+            failures += 1
+    wall = time.perf_counter() - started
+    return uploaded, {
+        'files': len(files),
+        'failures': failures,
+        'wall_seconds': wall,
+        'bytes': total_bytes,
+        'mb_per_second': total_bytes / (1024 * 1024) / wall if wall else None,
+        'spans': summarize_spans('upload_chunk'),
+    }
+
+
+def bench_sheets(services, api, uploaded, sheet_rows):
+    """Time update_spreadsheet against a sheet pre-filled with `sheet_rows` rows.
+
+    Half of the uploaded files already have a row (spread through the sheet); the
+    rest are appended as new entries.
+    """
+    spreadsheet_id = 'benchmark-sheet'
+    rows = [['Title'], ['Header'], ['Episode', 'Link']]
+    rows += [[f"existing-{i:06d}", ''] for i in range(sheet_rows)]
+    matched = uploaded[::2]
+    for offset, (filename, _) in enumerate(matched):
+        index = 3 + (offset * max(sheet_rows, 1)) // max(len(matched), 1)
+        if index < len(rows):
+            rows[index] = [filename, '']
+        else:
+            rows.append([filename, ''])
+    api.set_sheet_rows(spreadsheet_id, 'Sheet1', rows)
+
+    # Failures are counted rather than raised so the rest of the report is still written
+    started = time.perf_counter()
+    error = None
+    try:
+        services.update_spreadsheet(spreadsheet_id, 'Sheet1!A:B', uploaded, lambda unmatched: True)
+    except Exception as e:
+        error = str(e)
+    wall = time.perf_counter() - started
+    read_spans = summarize_spans('sheets_read')
+    write_spans = summarize_spans('sheets_write')
+    return {
+        'files': len(uploaded),
+        'existing_rows': sheet_rows,
+        'wall_seconds': wall,
+        'failed_calls': read_spans['errors'] + write_spans['errors'],
+        'error': error,
+        'read_spans': read_spans,
+        'write_spans': write_spans,
+    }
+
+
+def run(args):
+    work_dir = args.work_dir or os.path.join(tempfile.gettempdir(), 'podcast_uploader_bench')
+    corpus_dir = os.path.join(work_dir, f"corpus_{args.profile}_{args.scale}")
+    os.makedirs(work_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    source_files = generate_corpus(corpus_dir, args.profile, scale=args.scale, seed=args.seed)
+    corpus_seconds = time.perf_counter() - started
+    output_dir = tempfile.mkdtemp(prefix='mp3_', dir=work_dir)
+
+    results = {'corpus': {
+        'profile': args.profile,
+        'files': len(source_files),
+        'bytes': sum(os.path.getsize(p) for p in source_files),
+        'audio_seconds': sum(get_wav_duration(p) or 0 for p in source_files),
+        'generate_seconds': corpus_seconds,
+    }}
+
+    results['convert'] = bench_convert(source_files, output_dir)
+    mp3_files = sorted(
+        os.path.join(output_dir, f) for f in os.listdir(output_dir) if f.endswith('.mp3')
+    )
+    # Without FFmpeg the WAV sources stand in for the MP3s so the upload path is still measured
+    upload_files = mp3_files or source_files
+
+    api = FakeGoogleApi(latency=args.latency, bandwidth=args.bandwidth,
+                        error_rate=args.error_rate, seed=args.seed)
+    api.start()
+    try:
+        services = build_local_services(api.base_url)
+        uploaded, results['upload'] = bench_upload(services, upload_files)
+        results['upload']['source'] = 'mp3' if mp3_files else 'wav'
+        results['sheets'] = bench_sheets(services, api, uploaded, args.sheet_rows)
+        results['server'] = dict(api.stats)
+    finally:
+        api.stop()
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    return {
+        'schema': RESULTS_SCHEMA_VERSION,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {
+            'profile': args.profile,
+            'scale': args.scale,
+            'latency': args.latency,
+            'bandwidth': args.bandwidth,
+            'error_rate': args.error_rate,
+            'sheet_rows': args.sheet_rows,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+
+
+def flatten(data, prefix=''):
+    """Flatten nested dicts into {'a.b.c': value} for numeric leaves."""
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(before_path, after_path):
+    """Print every numeric result of two runs side by side with the ratio."""
+    with open(before_path, encoding='utf-8') as f:
+        before = flatten(json.load(f)['results'])
+    with open(after_path, encoding='utf-8') as f:
+        after = flatten(json.load(f)['results'])
+    width = max((len(k) for k in before.keys() | after.keys()), default=10)
+    for key in sorted(before.keys() | after.keys()):
+        old, new = before.get(key), after.get(key)
+        ratio = f"{new / old:8.3f}x" if old and new is not None else '        -'
+        print(f"{key:<{width}}  {old!s:>14}  {new!s:>14}  {ratio}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--profile', choices=sorted(CORPUS_PROFILES), default='mixed')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiply every corpus duration (e.g. 0.05 for a quick run)')
+    parser.add_argument('--work-dir', help='Where the corpus is cached between runs')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every API response')
+    parser.add_argument('--bandwidth', type=float, default=None, help='Upload bandwidth limit in bytes/s')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of API requests answered with 503')
+    parser.add_argument('--sheet-rows', type=int, default=3000, help='Existing rows in the benchmark sheet')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write results JSON here instead of stdout')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='Compare two results files instead of running')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    report = run(args)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+
+import google_auth_httplib2
+import httplib2
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+
+from metrics import get_recorder
+
+logger = logging.getLogger(__name__)
+
+# Refresh this long before the access token expires. google-auth's transports
+# refresh on their own within ~4 minutes of expiry, so staying ahead of that
+# means no request ever waits on a refresh.
+REFRESH_MARGIN_SECONDS = 300
+# Wait this long before retrying a failed background refresh
+RETRY_INTERVAL_SECONDS = 60
+# Timeout for each API transport built from the managed credentials
+HTTP_TIMEOUT_SECONDS = 120
+
+
+def utcnow():
+    """Naive UTC now, matching the naive UTC `expiry` google-auth stores."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class CredentialManager:
+    """Owns the OAuth credentials shared by every API transport in the process.
+
+    Tokens are stored as JSON (never pickled) and written atomically. A
+    background thread refreshes the access token shortly before it expires; the
+    Credentials object is updated in place, so every transport created by
+    `authorized_http` picks up the fresh token without refreshing itself.
+
+    Args:
+        credentials_path: OAuth client secrets (credentials.json)
+        token_path: JSON file the authorized user's token is stored in
+        scopes: OAuth scopes to request
+        refresh_margin: Seconds before expiry the background refresh runs
+    """
+
+    def __init__(self, credentials_path, token_path, scopes, refresh_margin=REFRESH_MARGIN_SECONDS):
+        self.credentials_path = credentials_path
+        self.token_path = token_path
+        self.scopes = scopes
+        self.refresh_margin = refresh_margin
+        self.credentials = None
+        self._lock = threading.RLock()
+        self._stop = None
+
+    def load(self):
+        """Load the stored token, returning None if it is missing or unreadable."""
+        if not os.path.exists(self.token_path):
+            return None
+        try:
+            with open(self.token_path, encoding='utf-8') as f:
+                return Credentials.from_authorized_user_info(json.load(f), self.scopes)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable token at {self.token_path}: {str(e)}")
+            return None
+
+    def save(self):
+        """Write the token atomically, readable only by the current user where supported."""
+        temp_path = self.token_path + '.tmp'
+        try:
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(self.credentials.to_json())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.token_path)
+            logger.info(f"Saved token to {self.token_path}")
+        except OSError as e:
+            logger.warning(f"Could not save token: {str(e)}")
+
+    def authorize(self):
+        """Return valid credentials, refreshing the stored token or running the OAuth flow."""
+        with self._lock:
+            if self.credentials is None:
+                self.credentials = self.load()
+                if self.credentials:
+                    logger.info("Loaded existing token")
+
+            if self.credentials and not self.credentials.valid and self.credentials.refresh_token:
+                logger.info("Token expired, refreshing...")
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.warning(f"Error refreshing token: {str(e)}")
+                    self.credentials = None
+
+            if not self.credentials or not self.credentials.valid:
+                logger.info("No valid credentials, starting OAuth flow...")
+                if not os.path.exists(self.credentials_path):
+                    raise FileNotFoundError(
+                        f"credentials.json not found at {self.credentials_path}. Please ensure it exists in the same directory as the application."
+                    )
+                try:
+                    flow = InstalledAppFlow.from_client_secrets_file(self.credentials_path, self.scopes)
+                    self.credentials = flow.run_local_server(port=0)
+                    logger.info("OAuth flow completed successfully")
+                except Exception as e:
+                    raise Exception(f"Failed to complete OAuth flow: {str(e)}")
+                self.save()
+
+            return self.credentials
+
+    def refresh(self):
+        """Refresh the access token now and persist it."""
+        with self._lock:
+            with get_recorder().span('token_refresh'):
+                self.credentials.refresh(Request())
+            self.save()
+            logger.info(f"Token refreshed; valid until {self.credentials.expiry} UTC")
+
+    def seconds_until_refresh(self):
+        """Seconds until the background refresh is due (None if the token never expires)."""
+        with self._lock:
+            expiry = self.credentials.expiry if self.credentials else None
+        if expiry is None:
+            return None
+        return max(0.0, (expiry - utcnow()).total_seconds() - self.refresh_margin)
+
+    def start(self):
+        """Start the background refresh thread (once per manager)."""
+        with self._lock:
+            if self._stop is not None:
+                return
+            self._stop = threading.Event()
+        threading.Thread(target=self._refresh_loop, args=(self._stop,), daemon=True).start()
+
+    def stop(self):
+        with self._lock:
+            if self._stop is not None:
+                self._stop.set()
+                self._stop = None
+
+    def _refresh_loop(self, stop):
+        while True:
+            delay = self.seconds_until_refresh()
+            if stop.wait(delay if delay is not None else RETRY_INTERVAL_SECONDS):
+                return
+            if delay is None or not self.credentials.refresh_token:
+                continue
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Background token refresh failed: {str(e)}")
+                if stop.wait(RETRY_INTERVAL_SECONDS):
+                    return
+
+    def authorized_http(self):
+        """Return a new HTTP transport that signs requests with the shared credentials.
+
+        httplib2 connections are not thread-safe, so each thread that talks to
+        the APIs should have its own transport.
+        """
+        http = httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS)
+        # Drive answers each resumable upload chunk with 308 and no Location
+        # header; httplib2 must not treat that as a redirect (as build_http does)
+        http.redirect_codes = http.redirect_codes - {308}
+        return google_auth_httplib2.AuthorizedHttp(self.credentials, http=http)
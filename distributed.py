@@ -0,0 +1,602 @@
+"""Distributed conversion: a coordinator hands encode jobs to worker processes over HTTP.
+
+Usage:
+
+    # On the machine that holds the WAV files (headless runner); listening
+    # beyond localhost requires a token
+    python distributed.py coordinator --host 0.0.0.0 --output D:/mp3 --port 8765 --token SECRET D:/wav/*.wav
+
+    # On every worker machine
+    python distributed.py worker --coordinator http://studio-pc:8765 --token SECRET
+
+    # Everything on localhost, e.g. to try it out
+    python distributed.py local-cluster --workers 3 --output ./mp3 ./wav/*.wav
+"""
+import argparse
+import glob
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from encoder import DEFAULT_PROFILE, EncodingProfile, analyse_source, encode_to_mp3, get_output_path
+from scheduler import plan_batch
+
+logger = logging.getLogger(__name__)
+
+# Workers send a heartbeat this often while they hold a job...
+HEARTBEAT_INTERVAL = 5.0
+# ...and lose the job if the coordinator hears nothing for this long
+HEARTBEAT_TIMEOUT = 20.0
+# A job that was handed out this many times without finishing is marked failed
+MAX_ATTEMPTS = 3
+# How long an idle worker waits before asking for work again
+IDLE_POLL_INTERVAL = 2.0
+# Size of the pieces files are streamed in
+STREAM_CHUNK_SIZE = 1024 * 1024
+# Largest MP3 a worker may send back (about 18 hours at 245 kbit/s)
+MAX_RESULT_BYTES = 2 * 1024 ** 3
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+def sha256_file(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_loopback(host):
+    """Return True if `host` only accepts connections from this machine."""
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == 'localhost'
+
+
+class Coordinator:
+    """Publishes encode jobs and collects the MP3s workers send back.
+
+    Jobs are handed out largest-first (see scheduler.plan_batch). Workers must
+    heartbeat while they hold a job; a reaper thread re-queues jobs whose worker
+    has gone quiet.
+
+    Args:
+        output_dir: Folder the returned MP3 files are written to
+        host: Interface to listen on
+        port: Port to listen on (0 picks a free port)
+        token: Shared secret workers must send in the X-Job-Token header;
+            required unless `host` is a loopback address
+        profile: EncodingProfile workers encode with
+    """
+
+    def __init__(self, output_dir, host='127.0.0.1', port=8765, token=None, profile=DEFAULT_PROFILE):
+        self.output_dir = output_dir
+        self.host = host
+        self.port = port
+        self.token = token
+        self.profile = profile
+        self.jobs = {}
+        self._order = []
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self.server = None
+        self.file_mode = 0o644
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        if host == '0.0.0.0':
+            host = socket.gethostname()
+        return f"http://{host}:{port}"
+
+    def submit(self, source_files):
+        """Queue source files for conversion, largest first."""
+        plan = plan_batch(source_files, max_workers=1)
+        with self._condition:
+            for job in plan.jobs:
+                job_id = uuid.uuid4().hex
+                self.jobs[job_id] = {
+                    'id': job_id,
+                    'source_path': job.source_path,
+                    'output_path': get_output_path(job.source_path, self.output_dir),
+                    'state': JOB_QUEUED,
+                    'worker': None,
+                    'heartbeat': None,
+                    'attempts': 0,
+                    'error': None,
+                    'queued_at': time.time(),
+                }
+                self._order.append(job_id)
+            self._condition.notify_all()
+
+    def start(self):
+        """Start the HTTP server and the heartbeat reaper."""
+        if not self.token and not is_loopback(self.host):
+            raise Exception(f"Refusing to listen on {self.host} without a token")
+        # Delivered files get the permissions a normally created file would
+        umask = os.umask(0)
+        os.umask(umask)
+        self.file_mode = 0o666 & ~umask
+
+        coordinator = self
+
+        class Handler(CoordinatorHandler):
+            pass
+        Handler.coordinator = coordinator
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._reap, daemon=True).start()
+        logger.info(f"Coordinator listening on {self.url}")
+        return self.url
+
+    def stop(self):
+        self._stop.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def _reap(self):
+        """Re-queue jobs held by workers that stopped sending heartbeats."""
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            now = time.time()
+            with self._condition:
+                for job in self.jobs.values():
+                    if job['state'] == JOB_RUNNING and now - job['heartbeat'] > HEARTBEAT_TIMEOUT:
+                        logger.warning(f"Worker {job['worker']} went quiet; re-queueing "
+                                       f"{os.path.basename(job['source_path'])}")
+                        self._requeue(job, f"worker {job['worker']} stopped sending heartbeats")
+                self._condition.notify_all()
+
+    def _requeue(self, job, error):
+        job['worker'] = None
+        job['heartbeat'] = None
+        job['error'] = error
+        job['state'] = JOB_FAILED if job['attempts'] >= MAX_ATTEMPTS else JOB_QUEUED
+
+    def claim(self, worker_id):
+        """Assign the next queued job to a worker, or return None."""
+        with self._condition:
+            for job_id in self._order:
+                job = self.jobs[job_id]
+                if job['state'] == JOB_QUEUED:
+                    job['state'] = JOB_RUNNING
+                    job['worker'] = worker_id
+                    job['heartbeat'] = time.time()
+                    job['attempts'] += 1
+                    return job
+        return None
+
+    def heartbeat(self, job_id, worker_id):
+        """Record a heartbeat; returns False if the worker no longer holds the job."""
+        with self._condition:
+            job = self.jobs.get(job_id)
+            if not job or job['state'] != JOB_RUNNING or job['worker'] != worker_id:
+                return False
+            job['heartbeat'] = time.time()
+            return True
+
+    def holds(self, job_id, worker_id):
+        with self._condition:
+            job = self.jobs.get(job_id)
+            return bool(job and job['state'] == JOB_RUNNING and job['worker'] == worker_id)
+
+    def complete(self, job_id, worker_id, temp_path):
+        """Move a verified result into place; returns False if the job was re-assigned meanwhile."""
+        with self._condition:
+            job = self.jobs.get(job_id)
+            if not job or job['state'] != JOB_RUNNING or job['worker'] != worker_id:
+                return False
+            # mkstemp creates the file readable only by its owner
+            os.chmod(temp_path, self.file_mode)
+            os.replace(temp_path, job['output_path'])
+            job['state'] = JOB_DONE
+            job['error'] = None
+            self._condition.notify_all()
+            logger.info(f"{worker_id} finished {os.path.basename(job['source_path'])}")
+            return True
+
+    def fail(self, job_id, worker_id, error):
+        """Record a worker-reported failure and re-queue the job if attempts remain."""
+        with self._condition:
+            job = self.jobs.get(job_id)
+            if job and job['state'] == JOB_RUNNING and job['worker'] == worker_id:
+                logger.warning(f"{worker_id} failed {os.path.basename(job['source_path'])}: {error}")
+                self._requeue(job, error)
+                self._condition.notify_all()
+
+    def wait(self, on_progress=None, timeout=None):
+        """Block until every job is done or failed.
+
+        Args:
+            on_progress: Callback(percent) whenever a job finishes
+            timeout: Seconds to wait before giving up (None waits forever)
+
+        Returns:
+            (converted, failed): lists of (source_path, output_path) and (source_path, error)
+        """
+        deadline = time.time() + timeout if timeout else None
+        with self._condition:
+            while True:
+                finished = [j for j in self.jobs.values() if j['state'] in (JOB_DONE, JOB_FAILED)]
+                if on_progress and self.jobs:
+                    on_progress(len(finished) / len(self.jobs) * 100)
+                if len(finished) == len(self.jobs):
+                    break
+                remaining = deadline - time.time() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            converted = [(j['source_path'], j['output_path']) for j in self.jobs.values() if j['state'] == JOB_DONE]
+            failed = [(j['source_path'], j['error']) for j in self.jobs.values() if j['state'] != JOB_DONE]
+        return converted, failed
+
+
+class CoordinatorHandler(BaseHTTPRequestHandler):
+    """HTTP API for workers; `coordinator` is set on a per-server subclass.
+
+    POST /jobs/claim                 -> job description, or 204 when there is no work
+    GET  /jobs/<id>/source           -> the source WAV file
+    POST /jobs/<id>/heartbeat        -> 200, or 409 if the job was taken away
+    PUT  /jobs/<id>/result           -> MP3 body with X-Content-SHA256; 409 if re-assigned
+    POST /jobs/<id>/fail             -> {"error": "..."}
+    """
+
+    coordinator = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def send_json(self, status, payload=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.send_response(status)
+        if payload is not None:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def authorized(self):
+        token = self.coordinator.token
+        if token and not hmac.compare_digest(self.headers.get('X-Job-Token', '').encode('utf-8'),
+                                             token.encode('utf-8')):
+            # Don't read the body of an unauthorized request; drop the connection instead
+            self.close_connection = True
+            self.send_json(401, {'error': 'invalid token'})
+            return False
+        return True
+
+    def route(self):
+        parts = self.path.strip('/').split('/')
+        job_id = parts[1] if len(parts) == 3 and parts[0] == 'jobs' else None
+        action = parts[2] if job_id else '/'.join(parts)
+        return job_id, action
+
+    def do_POST(self):
+        if not self.authorized():
+            return
+        job_id, action = self.route()
+        worker_id = self.headers.get('X-Worker-Id', 'unknown')
+
+        if action == 'jobs/claim':
+            self.read_json()
+            job = self.coordinator.claim(worker_id)
+            if job is None:
+                self.send_json(204)
+                return
+            self.send_json(200, {
+                'id': job['id'],
+                'name': os.path.basename(job['source_path']),
+                'size': os.path.getsize(job['source_path']),
+                'profile': self.coordinator.profile._asdict(),
+            })
+        elif action == 'heartbeat':
+            self.read_json()
+            alive = self.coordinator.heartbeat(job_id, worker_id)
+            self.send_json(200 if alive else 409, {'held': alive})
+        elif action == 'fail':
+            payload = self.read_json()
+            self.coordinator.fail(job_id, worker_id, payload.get('error', 'unknown error'))
+            self.send_json(200, {})
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_GET(self):
+        if not self.authorized():
+            return
+        job_id, action = self.route()
+        job = self.coordinator.jobs.get(job_id) if job_id else None
+        if action != 'source' or job is None:
+            self.send_json(404, {'error': 'not found'})
+            return
+
+        size = os.path.getsize(job['source_path'])
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/wav')
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        with open(job['source_path'], 'rb') as f:
+            shutil.copyfileobj(f, self.wfile, STREAM_CHUNK_SIZE)
+
+    def do_PUT(self):
+        if not self.authorized():
+            return
+        job_id, action = self.route()
+        worker_id = self.headers.get('X-Worker-Id', 'unknown')
+        length = int(self.headers.get('Content-Length') or 0)
+        if not 0 <= length <= MAX_RESULT_BYTES:
+            self.close_connection = True
+            self.send_json(413, {'error': 'result too large'})
+            return
+        if action != 'result' or job_id not in self.coordinator.jobs:
+            self.rfile.read(length)
+            self.send_json(404, {'error': 'not found'})
+            return
+
+        # Stream the MP3 to a temporary file next to its destination, hashing as it arrives
+        job = self.coordinator.jobs[job_id]
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(suffix='.part', dir=os.path.dirname(job['output_path']))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                remaining = length
+                while remaining > 0:
+                    chunk = self.rfile.read(min(STREAM_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+                    remaining -= len(chunk)
+
+            if remaining or digest.hexdigest() != self.headers.get('X-Content-SHA256'):
+                self.send_json(400, {'error': 'checksum mismatch'})
+                return
+            if not self.coordinator.complete(job_id, worker_id, temp_path):
+                self.send_json(409, {'error': 'job is no longer assigned to this worker'})
+                return
+            self.send_json(200, {})
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+class JobLost(Exception):
+    """The coordinator re-assigned a job while this worker was still processing it."""
+
+
+class Worker:
+    """Pulls encode jobs from a coordinator, encodes them locally and sends back the MP3.
+
+    Args:
+        coordinator_url: Base URL of the coordinator
+        token: Shared secret expected by the coordinator
+        work_dir: Folder for downloaded sources and encoded files (a temp folder if None)
+        worker_id: Name reported to the coordinator (host name and PID if None)
+    """
+
+    def __init__(self, coordinator_url, token=None, work_dir=None, worker_id=None):
+        self.coordinator_url = coordinator_url.rstrip('/')
+        self.token = token
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix='podcast_worker_')
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        os.makedirs(self.work_dir, exist_ok=True)
+
+    def request(self, method, path, body=None, headers=None, timeout=60):
+        all_headers = {'X-Worker-Id': self.worker_id}
+        if self.token:
+            all_headers['X-Job-Token'] = self.token
+        all_headers.update(headers or {})
+        if isinstance(body, dict):
+            body = json.dumps(body).encode('utf-8')
+            all_headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(self.coordinator_url + path, data=body,
+                                         method=method, headers=all_headers)
+        return urllib.request.urlopen(request, timeout=timeout)
+
+    def run(self, stop_event=None):
+        """Process jobs until `stop_event` is set."""
+        logger.info(f"Worker {self.worker_id} polling {self.coordinator_url}")
+        while not (stop_event and stop_event.is_set()):
+            try:
+                with self.request('POST', '/jobs/claim', {}) as response:
+                    job = json.loads(response.read()) if response.status == 200 else None
+            except (urllib.error.URLError, OSError) as e:
+                logger.warning(f"Cannot reach coordinator: {str(e)}")
+                job = None
+            if job is None:
+                time.sleep(IDLE_POLL_INTERVAL)
+                continue
+            self.process(job)
+
+    def process(self, job):
+        """Download, encode and return one job while heartbeating."""
+        job_dir = tempfile.mkdtemp(dir=self.work_dir)
+        source_path = os.path.join(job_dir, job['name'])
+        output_path = get_output_path(source_path, job_dir)
+        done = threading.Event()
+        lost = threading.Event()
+
+        def heartbeat():
+            while not done.wait(HEARTBEAT_INTERVAL):
+                try:
+                    with self.request('POST', f"/jobs/{job['id']}/heartbeat", {}):
+                        pass
+                except urllib.error.HTTPError as e:
+                    if e.code == 409:
+                        lost.set()
+                        return
+                except (urllib.error.URLError, OSError):
+                    pass
+
+        def check_held():
+            if lost.is_set():
+                raise JobLost()
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+        try:
+            with self.request('GET', f"/jobs/{job['id']}/source", timeout=300) as response, \
+                    open(source_path, 'wb') as f:
+                for chunk in iter(lambda: response.read(STREAM_CHUNK_SIZE), b''):
+                    check_held()
+                    f.write(chunk)
+            if os.path.getsize(source_path) != job['size']:
+                raise Exception("Source download was truncated")
+
+            profile = EncodingProfile(**job['profile'])
+            check_held()
+            _, trim, measurement = analyse_source(source_path, profile)
+            check_held()
+            encode_to_mp3(source_path, output_path, profile=profile, trim=trim, measurement=measurement)
+            check_held()
+
+            with open(output_path, 'rb') as f:
+                with self.request('PUT', f"/jobs/{job['id']}/result", f, timeout=300, headers={
+                    'Content-Type': 'audio/mpeg',
+                    'Content-Length': str(os.path.getsize(output_path)),
+                    'X-Content-SHA256': sha256_file(output_path),
+                }):
+                    pass
+            logger.info(f"Returned {os.path.basename(output_path)}")
+        except JobLost:
+            # The coordinator already handed the job to another worker; don't report a failure
+            logger.warning(f"Job {job['name']} was re-assigned; abandoning it")
+        except urllib.error.HTTPError as e:
+            if e.code != 409:
+                self.report_failure(job, f"Coordinator rejected result: HTTP {e.code}")
+        except Exception as e:
+            logger.error(f"Error processing {job['name']}: {str(e)}")
+            self.report_failure(job, str(e))
+        finally:
+            done.set()
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+    def report_failure(self, job, error):
+        try:
+            with self.request('POST', f"/jobs/{job['id']}/fail", {'error': error}):
+                pass
+        except (urllib.error.URLError, OSError):
+            pass  # The heartbeat timeout will re-queue the job
+
+
+def expand_sources(patterns):
+    files = []
+    for pattern in patterns:
+        matches = glob.glob(pattern, recursive=True)
+        files.extend(matches if matches else [pattern])
+    return [os.path.abspath(f) for f in files if os.path.isfile(f)]
+
+
+def run_coordinator(args, extra_workers=None):
+    os.makedirs(args.output, exist_ok=True)
+    coordinator = Coordinator(args.output, host=args.host, port=args.port, token=args.token)
+    coordinator.submit(expand_sources(args.sources))
+    coordinator.start()
+    try:
+        if extra_workers:
+            extra_workers(coordinator)
+        converted, failed = coordinator.wait()
+    finally:
+        coordinator.stop()
+    for source_path, error in failed:
+        logger.error(f"Failed: {source_path}: {error}")
+    logger.info(f"Converted {len(converted)} files, {len(failed)} failed")
+    return 1 if failed else 0
+
+
+def run_local_cluster(args):
+    """Run a coordinator and several worker processes on localhost."""
+    args.host = '127.0.0.1'
+    token = args.token or uuid.uuid4().hex
+    args.token = token
+    processes = []
+
+    def start_workers(coordinator):
+        url = f"http://127.0.0.1:{coordinator.server.server_address[1]}"
+        for i in range(args.workers):
+            processes.append(subprocess.Popen([
+                sys.executable, os.path.abspath(__file__), 'worker',
+                '--coordinator', url, '--token', token, '--worker-id', f"local-{i + 1}",
+            ]))
+        if args.kill_worker_after:
+            # Simulate a crashed worker to exercise heartbeat expiry and re-queueing
+            def kill_first():
+                time.sleep(args.kill_worker_after)
+                logger.warning("Killing worker local-1")
+                processes[0].kill()
+            threading.Thread(target=kill_first, daemon=True).start()
+
+    try:
+        return run_coordinator(args, extra_workers=start_workers)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed WAV to MP3 conversion")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    coordinator_parser = subparsers.add_parser('coordinator', help='Publish jobs and collect results')
+    cluster_parser = subparsers.add_parser('local-cluster', help='Coordinator plus workers on localhost')
+    for sub in (coordinator_parser, cluster_parser):
+        sub.add_argument('sources', nargs='+', help='WAV files or glob patterns')
+        sub.add_argument('--output', required=True, help='Folder for the MP3 files')
+        sub.add_argument('--host', default='127.0.0.1',
+                         help='Interface to listen on; anything but loopback requires --token')
+        sub.add_argument('--port', type=int, default=8765)
+        sub.add_argument('--token', help='Shared secret workers must present')
+    cluster_parser.add_argument('--workers', type=int, default=3)
+    cluster_parser.add_argument('--kill-worker-after', type=float,
+                                help='Kill one worker after this many seconds to test re-queueing')
+    cluster_parser.set_defaults(port=0)
+
+    worker_parser = subparsers.add_parser('worker', help='Pull and encode jobs')
+    worker_parser.add_argument('--coordinator', required=True, help='Coordinator URL')
+    worker_parser.add_argument('--token')
+    worker_parser.add_argument('--work-dir')
+    worker_parser.add_argument('--worker-id')
+
+    args = parser.parse_args(argv)
+    if args.command == 'coordinator' and not args.token and not is_loopback(args.host):
+        parser.error(f"--token is required to listen on {args.host}")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == 'coordinator':
+        return run_coordinator(args)
+    if args.command == 'local-cluster':
+        return run_local_cluster(args)
+    Worker(args.coordinator, args.token, args.work_dir, args.worker_id).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,278 @@
+import logging
+import queue
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+
+logger = logging.getLogger(__name__)
+
+# Cached folder listings are reused for this many seconds
+DEFAULT_CACHE_TTL = 300
+# Drive's alias for the top of My Drive
+MY_DRIVE_ID = 'root'
+# How often the Tk thread checks for finished Drive requests (ms)
+POLL_INTERVAL_MS = 50
+
+
+class FolderCache:
+    """Child folder listings keyed by parent folder ID, each expiring after `ttl` seconds."""
+
+    def __init__(self, ttl=DEFAULT_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, parent_id):
+        """Return the cached children of a folder, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(parent_id)
+        if entry and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+        return None
+
+    def put(self, parent_id, folders):
+        with self._lock:
+            self._entries[parent_id] = (time.monotonic(), folders)
+
+    def invalidate(self, parent_ids=None):
+        """Drop the listed folders' entries, or everything when `parent_ids` is None."""
+        with self._lock:
+            if parent_ids is None:
+                self._entries.clear()
+            else:
+                for parent_id in parent_ids:
+                    self._entries.pop(parent_id, None)
+
+
+class DriveFolderBrowser(tk.Frame):
+    """Tree of Google Drive folders that loads each folder's children when it is expanded.
+
+    My Drive and every shared drive appear as top-level nodes. Listings are
+    fetched on a single background thread (the API client is not thread-safe),
+    cached per folder for `cache_ttl` seconds, and the name search runs on the
+    server so large drives never have to be listed in full.
+
+    Args:
+        master: Parent widget
+        google_services: GoogleServices instance, or None when sign-in failed
+        cache_ttl: Seconds a folder listing stays fresh
+        height: Visible rows in the tree
+    """
+
+    def __init__(self, master, google_services, cache_ttl=DEFAULT_CACHE_TTL, height=8, **kwargs):
+        super().__init__(master, **kwargs)
+        self.google_services = google_services
+        self.cache = FolderCache(cache_ttl)
+        self._folder_ids = {}  # tree item -> Drive folder ID
+        self._loading = set()  # tree items whose children are being fetched
+        self._search_item = None
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._pending = 0
+        self._polling = False
+
+        bg = kwargs.get('bg')
+        search_frame = tk.Frame(self, bg=bg)
+        search_frame.pack(fill="x", pady=(0, 5))
+
+        self.search_var = tk.StringVar()
+        self.search_entry = tk.Entry(search_frame,
+                                     textvariable=self.search_var,
+                                     font=("Segoe UI", 10))
+        self.search_entry.pack(side="left", fill="x", expand=True, padx=(0, 10))
+        self.search_entry.bind('<Return>', lambda event: self.search())
+
+        self.search_button = tk.Button(search_frame,
+                                       text="Search",
+                                       command=self.search,
+                                       bg="#2196F3",
+                                       fg="white",
+                                       font=("Segoe UI", 10),
+                                       relief="flat",
+                                       padx=15)
+        self.search_button.pack(side="left", padx=(0, 10))
+
+        self.refresh_button = tk.Button(search_frame,
+                                        text="Refresh",
+                                        command=self.refresh,
+                                        bg="#2196F3",
+                                        fg="white",
+                                        font=("Segoe UI", 10),
+                                        relief="flat",
+                                        padx=15)
+        self.refresh_button.pack(side="left")
+
+        tree_frame = tk.Frame(self, bg=bg)
+        tree_frame.pack(fill="both", expand=True)
+
+        self.tree = ttk.Treeview(tree_frame, show="tree", selectmode="browse", height=height)
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        self.tree.bind('<<TreeviewOpen>>', self.on_open)
+
+        threading.Thread(target=self._fetch_worker, daemon=True).start()
+        self.load_roots()
+
+    def selected_folder_id(self):
+        """Return the Drive ID of the selected folder, or None."""
+        selection = self.tree.selection()
+        return self._folder_ids.get(selection[0]) if selection else None
+
+    def set_enabled(self, enabled):
+        """Enable or disable selection, search and refresh."""
+        state = tk.NORMAL if enabled else tk.DISABLED
+        self.tree.configure(selectmode="browse" if enabled else "none")
+        for widget in (self.search_entry, self.search_button, self.refresh_button):
+            widget.config(state=state)
+
+    def load_roots(self):
+        """Show My Drive and the shared drives as top-level nodes."""
+        if self.google_services is None:
+            return
+        self.add_folder_node('', {'id': MY_DRIVE_ID, 'name': 'My Drive'})
+
+        def on_drives(drives, error):
+            for drive in drives or []:
+                self.add_folder_node('', drive)
+        self._fetch(self.google_services.get_shared_drives, (), on_drives)
+
+    def add_folder_node(self, parent_item, folder, index='end'):
+        """Insert a folder with a placeholder child so it can be expanded before it is loaded."""
+        item = self.tree.insert(parent_item, index, text=folder.get('name', ''))
+        self._folder_ids[item] = folder['id']
+        self.tree.insert(item, 'end', text="Loading...", tags=('placeholder',))
+        return item
+
+    def is_loaded(self, item):
+        children = self.tree.get_children(item)
+        return not (children and 'placeholder' in self.tree.item(children[0], 'tags'))
+
+    def on_open(self, event=None):
+        self.load_children(self.tree.focus())
+
+    def load_children(self, item):
+        """Fill in a folder's children from the cache, or fetch them in the background."""
+        folder_id = self._folder_ids.get(item)
+        if folder_id is None or self.is_loaded(item) or item in self._loading:
+            return
+
+        cached = self.cache.get(folder_id)
+        if cached is not None:
+            self._fill(item, cached)
+            return
+
+        def on_children(folders, error):
+            self._loading.discard(item)
+            if not self.tree.exists(item):
+                return
+            if error:
+                # Leave the placeholder tagged so expanding the folder again retries
+                placeholder = self.tree.get_children(item)[0]
+                self.tree.item(placeholder, text=f"Error: {error}")
+                return
+            self.cache.put(folder_id, folders)
+            self._fill(item, folders)
+
+        self._loading.add(item)
+        self._fetch(self.google_services.get_child_folders, (folder_id,), on_children)
+
+    def _fill(self, item, folders):
+        self._remove_children(item)
+        for folder in folders:
+            self.add_folder_node(item, folder)
+
+    def _remove_children(self, item):
+        for child in self.tree.get_children(item):
+            self._remove_children(child)
+            self._folder_ids.pop(child, None)
+            self._loading.discard(child)
+        self.tree.delete(*self.tree.get_children(item))
+
+    def refresh(self):
+        """Reload the selected folder's subtree, or the whole tree when nothing is selected."""
+        if self.google_services is None:
+            return
+        selection = self.tree.selection()
+        item = selection[0] if selection else None
+        if item not in self._folder_ids:
+            self.cache.invalidate()
+            self._search_item = None
+            self._remove_children('')
+            self.load_roots()
+            return
+
+        stale = []
+        pending = [item]
+        while pending:
+            current = pending.pop()
+            if current in self._folder_ids:
+                stale.append(self._folder_ids[current])
+            pending.extend(self.tree.get_children(current))
+        self.cache.invalidate(stale)
+
+        self._remove_children(item)
+        self.tree.insert(item, 'end', text="Loading...", tags=('placeholder',))
+        if self.tree.item(item, 'open'):
+            self.load_children(item)
+
+    def search(self):
+        """Search folder names on the server and list the matches at the top of the tree."""
+        if self.google_services is None:
+            return
+        if self._search_item and self.tree.exists(self._search_item):
+            self._remove_children(self._search_item)
+            self.tree.delete(self._search_item)
+        self._search_item = None
+
+        query = self.search_var.get().strip()
+        if not query:
+            return
+
+        search_item = self.tree.insert('', 0, text=f"Search results for \"{query}\"", open=True)
+        self.tree.insert(search_item, 'end', text="Searching...", tags=('placeholder',))
+        self._search_item = search_item
+
+        def on_results(folders, error):
+            if search_item != self._search_item or not self.tree.exists(search_item):
+                return  # A newer search replaced this one
+            self._remove_children(search_item)
+            if error:
+                self.tree.insert(search_item, 'end', text=f"Error: {error}")
+            elif not folders:
+                self.tree.insert(search_item, 'end', text="No matching folders")
+            for folder in folders or []:
+                self.add_folder_node(search_item, folder)
+        self._fetch(self.google_services.search_folders, (query,), on_results)
+
+    def _fetch(self, func, args, on_done):
+        """Run a Drive call on the fetch thread; on_done(result, error) runs on the Tk thread."""
+        self._pending += 1
+        self._requests.put((func, args, on_done))
+        if not self._polling:
+            self._polling = True
+            self.after(POLL_INTERVAL_MS, self._poll)
+
+    def _fetch_worker(self):
+        while True:
+            func, args, on_done = self._requests.get()
+            try:
+                self._results.put((on_done, func(*args), None))
+            except Exception as e:
+                logger.error(f"Error loading Drive folders: {str(e)}")
+                self._results.put((on_done, None, str(e)))
+
+    def _poll(self):
+        while True:
+            try:
+                on_done, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            on_done(result, error)
+        if self._pending:
+            self.after(POLL_INTERVAL_MS, self._poll)
+        else:
+            self._polling = False
@@ -0,0 +1,276 @@
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from job_journal import STAGE_CONVERTED
+from loudness import (DEFAULT_LOUDNESS_RANGE, DEFAULT_TRUE_PEAK, hash_and_measure,
+                      loudnorm_filter, measurement_key)
+from metrics import get_recorder
+from scheduler import plan_batch
+from silence import DEFAULT_THRESHOLD_DB, find_trim_points
+from wav_info import read_wav_info
+
+logger = logging.getLogger(__name__)
+
+# Settings that determine the encoded output; loudness_target is in LUFS (None disables normalisation)
+EncodingProfile = namedtuple(
+    'EncodingProfile',
+    ['quality', 'trim_silence', 'silence_threshold_db',
+     'loudness_target', 'true_peak', 'loudness_range'],
+    defaults=[2, False, DEFAULT_THRESHOLD_DB, None, DEFAULT_TRUE_PEAK, DEFAULT_LOUDNESS_RANGE]
+)
+DEFAULT_PROFILE = EncodingProfile()
+
+# Sample rates libmp3lame can encode
+MP3_SAMPLE_RATES = (8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000)
+
+
+def profile_key(profile, tags=None, cover_path=None):
+    """Return a stable string identifying everything that shapes an output file, stored in the job journal.
+
+    ID3 tags and the cover image are included when present, so editing the
+    catalogue re-encodes the affected files.
+    """
+    settings = profile._asdict()
+    if tags:
+        settings['tags'] = tags
+    if cover_path:
+        stat = os.stat(cover_path)
+        settings['cover'] = [os.path.abspath(cover_path), stat.st_size, stat.st_mtime]
+    return json.dumps(settings, sort_keys=True)
+
+
+def get_output_path(source_path, output_dir):
+    """Return the MP3 path a source WAV file is converted to."""
+    filename = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(output_dir, f"{filename}.mp3")
+
+
+def get_output_sample_rate(source_rate):
+    """Return the MP3 sample rate closest to a source rate, never above it unless unavoidable."""
+    if source_rate in MP3_SAMPLE_RATES:
+        return source_rate
+    lower = [rate for rate in MP3_SAMPLE_RATES if rate <= source_rate]
+    return lower[-1] if lower else MP3_SAMPLE_RATES[0]
+
+
+def build_ffmpeg_command(source_path, output_path, profile=DEFAULT_PROFILE, trim=None,
+                         measurement=None, sample_rate=None, tags=None, cover_path=None):
+    """Return the FFmpeg command line that encodes a WAV file to MP3.
+
+    `trim` (a silence.TrimPoints) is applied as input seeking, so FFmpeg only
+    decodes the audible part and no intermediate WAV is written. `measurement`
+    (a loudness.LoudnessMeasurement) turns on the second loudnorm pass. `tags`
+    (FFmpeg metadata keys) and `cover_path` are written as ID3v2.3 frames by the
+    same encode, so tagging never rewrites the MP3.
+    """
+    command = ['ffmpeg', '-y']
+    if trim:
+        command += ['-ss', f"{trim.start:.3f}", '-t', f"{trim.end - trim.start:.3f}"]
+    command += ['-i', source_path]
+    if cover_path:
+        command += ['-i', cover_path]
+    if measurement and profile.loudness_target is not None:
+        command += ['-af', loudnorm_filter(profile.loudness_target, profile.true_peak,
+                                           profile.loudness_range, measurement)]
+        # loudnorm resamples to 192 kHz internally; go back to the source rate
+        if sample_rate:
+            command += ['-ar', str(get_output_sample_rate(sample_rate))]
+    if cover_path:
+        # The image is stored as-is in an APIC frame
+        command += ['-map', '0:a', '-map', '1:v', '-codec:v', 'copy',
+                    '-metadata:s:v', 'title=Album cover', '-metadata:s:v', 'comment=Cover (front)']
+    for key, value in (tags or {}).items():
+        command += ['-metadata', f"{key}={value}"]
+    if tags or cover_path:
+        command += ['-id3v2_version', '3']
+    # FFmpeg command with better quality settings
+    command += ['-codec:a', 'libmp3lame', '-qscale:a', str(profile.quality),
+                output_path]
+    return command
+
+
+def analyse_source(source_path, profile, content_hash=None, loudness_cache=None):
+    """Run the pre-encode analysis an encoding profile asks for.
+
+    Silence is located first, so loudness is measured over the part that will be
+    kept. A cached loudness measurement is used when the content hash is known;
+    otherwise the measurement pass also produces the hash.
+
+    Returns:
+        (content_hash, trim, measurement); trim and measurement may be None
+    """
+    trim = None
+    if profile.trim_silence:
+        try:
+            trim = find_trim_points(source_path, profile.silence_threshold_db)
+        except Exception as e:
+            logger.warning(f"Could not analyse silence in {source_path}: {str(e)}")
+        if trim:
+            logger.info(f"Trimming {os.path.basename(source_path)} to "
+                        f"{trim.start:.2f}s-{trim.end:.2f}s")
+
+    measurement = None
+    if profile.loudness_target is not None:
+        if content_hash and loudness_cache:
+            measurement = loudness_cache.get(measurement_key(content_hash, trim))
+        if measurement is None:
+            content_hash, measurement = hash_and_measure(
+                source_path, profile.loudness_target, profile.true_peak,
+                profile.loudness_range, trim
+            )
+            if loudness_cache:
+                loudness_cache.put(measurement_key(content_hash, trim), measurement)
+        else:
+            logger.info(f"Using cached loudness measurement for {os.path.basename(source_path)}")
+
+    return content_hash, trim, measurement
+
+
+def encode_to_mp3(source_path, output_path, queue_wait=0.0, profile=DEFAULT_PROFILE,
+                  trim=None, measurement=None, tags=None, cover_path=None):
+    """Encode a single WAV file to MP3 with FFmpeg."""
+    try:
+        info = read_wav_info(source_path)
+        audio_seconds, sample_rate = info.duration, info.sample_rate
+    except (OSError, ValueError):
+        audio_seconds, sample_rate = None, None
+    if trim:
+        audio_seconds = trim.end - trim.start
+
+    try:
+        with get_recorder().span('encode', file=source_path,
+                                 bytes=os.path.getsize(source_path),
+                                 audio_seconds=audio_seconds,
+                                 queue_wait=queue_wait):
+            subprocess.run(
+                build_ffmpeg_command(source_path, output_path, profile,
+                                     trim, measurement, sample_rate, tags, cover_path),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                check=True
+            )
+    except subprocess.CalledProcessError as e:
+        raise Exception(f"FFmpeg error: {e.stderr}")
+
+
+def convert_batch(source_files, output_dir, journal=None, plan=None, profile=DEFAULT_PROFILE,
+                  loudness_cache=None, tags=None, cover_path=None, on_file_start=None,
+                  on_progress=None, on_error=None):
+    """Convert a batch of WAV files to MP3 without any UI.
+
+    Args:
+        source_files: Paths of the WAV files to convert
+        output_dir: Folder the MP3 files are written to
+        journal: Optional JobJournal used to skip files converted in an earlier run
+        plan: Optional BatchPlan from scheduler.plan_batch; one is made if omitted
+        profile: EncodingProfile to encode with
+        loudness_cache: Optional LoudnessCache so re-encodes skip the measurement pass
+        tags: Optional {source_path: {ffmpeg metadata key: value}} written as ID3 tags
+        cover_path: Optional JPEG or PNG embedded as cover art in every file
+        on_file_start: Callback(index, total, source_path) before each file
+        on_progress: Callback(percent) after each file
+        on_error: Callback(source_path, exception) for files that failed
+
+    Returns:
+        List of (source_path, output_path) pairs for every converted file,
+        in the order of `source_files`
+    """
+    if plan is None:
+        plan = plan_batch(source_files)
+    total_files = len(plan.jobs)
+    batch_started = time.perf_counter()
+    converted = {}
+    lock = threading.Lock()
+    started_count = [0]
+    finished_count = [0]
+
+    def convert_one(file_path):
+        # Time the job spent queued, before its own analysis passes start
+        queue_wait = time.perf_counter() - batch_started
+        with lock:
+            started_count[0] += 1
+            index = started_count[0]
+        try:
+            if on_file_start:
+                on_file_start(index, total_files, file_path)
+            output_file = get_output_path(file_path, output_dir)
+            file_tags = tags.get(file_path) if tags else None
+            key = profile_key(profile, file_tags, cover_path)
+
+            content_hash = journal.cached_hash(file_path) if journal else None
+            trim = measurement = None
+            analysed = False
+            if journal and content_hash is None:
+                if profile.loudness_target is None:
+                    content_hash = journal.content_hash(file_path)
+                else:
+                    # The loudness measurement pass reads the whole file anyway; hash from the same read
+                    content_hash, trim, measurement = analyse_source(file_path, profile, None, loudness_cache)
+                    analysed = True
+
+            # Skip files the journal says were already converted from the same content and profile
+            skipped = False
+            if journal:
+                job = journal.reached(file_path, STAGE_CONVERTED, content_hash)
+                if (job and job['output_path'] == output_file and job['profile_key'] == key
+                        and os.path.exists(output_file)):
+                    logger.info(f"Skipping {os.path.basename(file_path)}: already converted")
+                    skipped = True
+
+            if not skipped:
+                if not analysed:
+                    content_hash, trim, measurement = analyse_source(
+                        file_path, profile, content_hash, loudness_cache
+                    )
+                encode_to_mp3(file_path, output_file,
+                              queue_wait=queue_wait,
+                              profile=profile,
+                              trim=trim,
+                              measurement=measurement,
+                              tags=file_tags,
+                              cover_path=cover_path)
+                if journal:
+                    stat = os.stat(file_path)
+                    journal.record(file_path, STAGE_CONVERTED,
+                                   content_hash=content_hash,
+                                   source_size=stat.st_size,
+                                   source_mtime=stat.st_mtime,
+                                   output_path=output_file,
+                                   profile_key=key)
+            with lock:
+                converted[file_path] = output_file
+
+        except Exception as e:
+            logger.error(f"Error converting {file_path}: {str(e)}")
+            if on_error:
+                on_error(file_path, e)
+        finally:
+            with lock:
+                finished_count[0] += 1
+                progress = (finished_count[0] / total_files) * 100
+            if on_progress:
+                on_progress(progress)
+
+    # Jobs are submitted largest-first; the pool hands them out in that order
+    ordered_files = [job.source_path for job in plan.jobs]
+    if plan.workers > 1:
+        with ThreadPoolExecutor(max_workers=plan.workers) as pool:
+            list(pool.map(convert_one, ordered_files))
+    else:
+        for file_path in ordered_files:
+            convert_one(file_path)
+
+    if journal:
+        try:
+            journal.flush()
+        except Exception as e:
+            logger.error(f"Error writing job journal: {str(e)}")
+
+    return [(p, converted[p]) for p in source_files if p in converted]
@@ -0,0 +1,104 @@
+import logging
+import os
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Header names (lowercase) recognised for each catalogue column
+COLUMN_ALIASES = {
+    'title': ('title', 'episode title'),
+    'episode': ('episode', 'episode number', 'episode no', 'episode #', 'ep', 'no', '#'),
+    'date': ('date', 'release date', 'air date', 'published', 'publish date'),
+    'description': ('description', 'summary', 'notes', 'show notes'),
+}
+# The header is looked for in this many rows at the top of the sheet
+HEADER_SEARCH_ROWS = 3
+# Google Sheets serial dates count days from this epoch
+SHEETS_EPOCH = datetime(1899, 12, 30)
+# Cover images FFmpeg can embed without re-encoding
+COVER_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+EpisodeMetadata = namedtuple('EpisodeMetadata', ['title', 'episode', 'date', 'description'])
+
+
+def normalise_name(name):
+    """Return the key a sheet row or source file is matched on: lowercase, without audio extension."""
+    name = os.path.basename(str(name).strip())
+    stem, extension = os.path.splitext(name)
+    if extension.lower() in ('.wav', '.mp3'):
+        name = stem
+    return name.lower()
+
+
+def format_cell(value, column):
+    """Turn an unformatted cell value into tag text."""
+    if value is None or value == '':
+        return None
+    if column == 'date' and isinstance(value, (int, float)):
+        # Dates are read as serial numbers so their format doesn't depend on the sheet's locale
+        return (SHEETS_EPOCH + timedelta(days=value)).strftime('%Y-%m-%d')
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip() or None
+
+
+def find_header(rows):
+    """Return (row index, {column: cell index}) of the header row, or (None, {})."""
+    best_index, best_columns = None, {}
+    for index, row in enumerate(rows[:HEADER_SEARCH_ROWS]):
+        columns = {}
+        # Column A holds the file name
+        for cell_index, cell in enumerate(row[1:], 1):
+            label = str(cell).strip().lower()
+            for column, aliases in COLUMN_ALIASES.items():
+                if label in aliases and column not in columns:
+                    columns[column] = cell_index
+        if len(columns) > len(best_columns):
+            best_index, best_columns = index, columns
+    return best_index, best_columns
+
+
+def parse_metadata_rows(rows):
+    """Build a catalogue from sheet rows: {normalised file name: EpisodeMetadata}.
+
+    File names are in column A, as update_spreadsheet expects. The other
+    columns are found by their header names, so their order doesn't matter.
+    """
+    header_index, columns = find_header(rows)
+    if header_index is None:
+        logger.warning("No Title, Episode, Date or Description header found in the sheet")
+        return {}
+
+    catalogue = {}
+    for row in rows[header_index + 1:]:
+        if not row or row[0] in (None, ''):
+            continue
+        values = {column: format_cell(row[i], column) if i < len(row) else None
+                  for column, i in columns.items()}
+        catalogue.setdefault(normalise_name(row[0]), EpisodeMetadata(
+            values.get('title'), values.get('episode'), values.get('date'), values.get('description')
+        ))
+    return catalogue
+
+
+def id3_tags(metadata):
+    """Map episode metadata to FFmpeg metadata keys (written as ID3v2 frames), skipping blanks."""
+    tags = {
+        'title': metadata.title,
+        'track': metadata.episode,
+        'date': metadata.date,
+        'comment': metadata.description,
+    }
+    return {key: value for key, value in tags.items() if value}
+
+
+def match_tags(catalogue, source_files):
+    """Return {source path: FFmpeg tags} for the source files that have a catalogue row."""
+    tags = {}
+    for source_path in source_files:
+        metadata = catalogue.get(normalise_name(source_path))
+        file_tags = id3_tags(metadata) if metadata else None
+        if file_tags:
+            tags[source_path] = file_tags
+    return tags
@@ -0,0 +1,207 @@
+import json
+import logging
+import os
+import statistics
+import time
+from collections import deque, namedtuple
+
+from encoder import DEFAULT_PROFILE, get_output_path, profile_key
+from job_journal import STAGE_CONVERTED
+from metrics import read_recent_records
+from scheduler import estimate_makespan
+
+logger = logging.getLogger(__name__)
+
+# Average bitrate (kbit/s) libmp3lame's VBR produces at each -qscale:a setting
+VBR_BITRATES = {0: 245, 1: 225, 2: 190, 3: 175, 4: 165, 5: 130, 6: 115, 7: 100, 8: 85, 9: 65}
+# Upload throughput assumed when no upload has been measured yet (bytes per second)
+DEFAULT_UPLOAD_BYTES_PER_SECOND = 1024 * 1024
+# Read throughput assumed for a pre-encode analysis pass that hasn't been measured yet
+DEFAULT_ANALYSIS_BYTES_PER_SECOND = 32 * 1024 * 1024
+# Only the most recent measurements are used, so estimates follow changes in hardware and network
+HISTORY_SIZE = 500
+# Calibration needs this many past batches before it is applied...
+MIN_CALIBRATION_SAMPLES = 3
+# ...and is clamped to this range so one odd batch can't throw estimates off
+CALIBRATION_RANGE = (0.2, 5.0)
+
+# Quantities that are predicted, and later compared with what actually happened
+QUANTITIES = ('encode_seconds', 'output_bytes', 'upload_seconds', 'sheets_calls')
+
+BatchEstimate = namedtuple('BatchEstimate', [
+    'files', 'pending_files', 'audio_seconds', 'workers',
+    'output_bytes', 'encode_seconds', 'upload_seconds', 'sheets_calls',
+    'upload_bytes_per_second', 'upload_measured', 'model',
+])
+
+
+def load_throughput_history(metrics_path, stage, limit=HISTORY_SIZE):
+    """Return the throughput in bytes per second of a stage's most recent spans in a metrics file."""
+    rates = deque(maxlen=limit)
+    if not metrics_path or not os.path.exists(metrics_path):
+        return []
+    try:
+        for record in read_recent_records(metrics_path):
+            if (record.get('stage') == stage and not record.get('error')
+                    and record.get('bytes') and record.get('wall_seconds')):
+                rates.append(record['bytes'] / record['wall_seconds'])
+    except OSError as e:
+        logger.warning(f"Could not read {stage} history: {str(e)}")
+    return list(rates)
+
+
+def load_calibration(estimates_path, limit=HISTORY_SIZE):
+    """Return a correction factor per quantity: the median of actual / modelled in past batches."""
+    ratios = {quantity: deque(maxlen=limit) for quantity in QUANTITIES}
+    if estimates_path and os.path.exists(estimates_path):
+        try:
+            for record in read_recent_records(estimates_path):
+                for quantity, actual in record.get('actual', {}).items():
+                    modelled = record.get('model', {}).get(quantity)
+                    if quantity in ratios and modelled and actual is not None:
+                        ratios[quantity].append(actual / modelled)
+        except OSError as e:
+            logger.warning(f"Could not read estimate history: {str(e)}")
+
+    low, high = CALIBRATION_RANGE
+    return {
+        quantity: min(max(statistics.median(values), low), high)
+        if len(values) >= MIN_CALIBRATION_SAMPLES else 1.0
+        for quantity, values in ratios.items()
+    }
+
+
+def is_converted(journal, source_path, output_dir, profile, tags=None, cover_path=None):
+    """Return True if convert_batch is expected to skip a file, without hashing it."""
+    content_hash = journal.cached_hash(source_path)
+    if content_hash is None:
+        return False
+    output_path = get_output_path(source_path, output_dir)
+    job = journal.reached(source_path, STAGE_CONVERTED, content_hash)
+    return bool(job and job['output_path'] == output_path
+                and job['profile_key'] == profile_key(profile, tags, cover_path)
+                and os.path.exists(output_path))
+
+
+def estimate_batch(plan, profile=DEFAULT_PROFILE, output_dir=None, journal=None,
+                   metrics_path=None, estimates_path=None, tags=None, cover_path=None):
+    """Predict what converting, uploading and documenting a planned batch will cost.
+
+    Encode time is the plan's largest-first makespan over files the journal
+    doesn't already have, at the plan's worker count, including the silence
+    scan and loudness measurement passes the profile asks for. Output size comes from
+    the audio duration in the WAV headers and the VBR quality. Upload time uses
+    the median throughput of past upload chunks. Each prediction is then scaled
+    by how far off earlier predictions were (see record_actuals).
+
+    Args:
+        plan: BatchPlan from scheduler.plan_batch
+        profile: EncodingProfile the batch will be encoded with
+        output_dir: Output folder, used with `journal` to spot files that will be skipped
+        journal: Optional JobJournal
+        metrics_path: Metrics JSON-lines history
+        estimates_path: JSON-lines history of earlier estimates and actuals
+        tags, cover_path: ID3 tags and cover art the batch will be encoded with (see convert_batch)
+    """
+    tags = tags or {}
+    pending = [job for job in plan.jobs
+               if not (journal and output_dir and is_converted(journal, job.source_path, output_dir, profile,
+                                                               tags.get(job.source_path), cover_path))]
+    audio_seconds = sum(job.audio_seconds for job in plan.jobs)
+
+    # Silence trimming and loudness normalisation each read the whole source before it is encoded
+    analysis_stages = []
+    if profile.trim_silence:
+        analysis_stages.append('silence_scan')
+    if profile.loudness_target is not None:
+        analysis_stages.append('loudness_measure')
+    seconds_per_byte = 0.0
+    for stage in analysis_stages:
+        history = load_throughput_history(metrics_path, stage)
+        seconds_per_byte += 1 / (statistics.median(history) if history else DEFAULT_ANALYSIS_BYTES_PER_SECOND)
+    if seconds_per_byte:
+        pending = [job._replace(estimated_seconds=job.estimated_seconds
+                                + job.audio_seconds * job.byte_rate * seconds_per_byte)
+                   for job in pending]
+
+    upload_history = load_throughput_history(metrics_path, 'upload_chunk')
+    upload_rate = statistics.median(upload_history) if upload_history else DEFAULT_UPLOAD_BYTES_PER_SECOND
+
+    bitrate = VBR_BITRATES.get(profile.quality, VBR_BITRATES[2]) * 1000 / 8
+    output_bytes = audio_seconds * bitrate
+    model = {
+        'encode_seconds': estimate_makespan(pending, plan.workers),
+        'output_bytes': output_bytes,
+        'upload_seconds': output_bytes / upload_rate,
+        # One read of the sheet, then at most one write per file
+        'sheets_calls': 1 + len(plan.jobs) if plan.jobs else 0,
+    }
+    calibration = load_calibration(estimates_path)
+
+    return BatchEstimate(
+        files=len(plan.jobs),
+        pending_files=len(pending),
+        audio_seconds=audio_seconds,
+        workers=plan.workers,
+        output_bytes=int(model['output_bytes'] * calibration['output_bytes']),
+        encode_seconds=model['encode_seconds'] * calibration['encode_seconds'],
+        upload_seconds=model['upload_seconds'] * calibration['upload_seconds'],
+        sheets_calls=int(round(model['sheets_calls'] * calibration['sheets_calls'])),
+        upload_bytes_per_second=upload_rate,
+        upload_measured=bool(upload_history),
+        model=model,
+    )
+
+
+def record_actuals(estimates_path, estimate, **actual):
+    """Append what a batch actually cost next to its prediction.
+
+    Only the quantities passed in `actual` (any of QUANTITIES) are recorded, so
+    conversion and upload can report separately. Future estimates are corrected
+    by the median ratio of actual to modelled values.
+    """
+    record = {
+        'recorded_at': time.time(),
+        'files': estimate.files,
+        'predicted': {quantity: getattr(estimate, quantity) for quantity in actual},
+        'model': {quantity: estimate.model[quantity] for quantity in actual},
+        'actual': actual,
+    }
+    for quantity, value in actual.items():
+        logger.info(f"{quantity}: predicted {record['predicted'][quantity]:.0f}, actual {value:.0f}")
+    try:
+        with open(estimates_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+    except OSError as e:
+        logger.warning(f"Could not record batch actuals: {str(e)}")
+
+
+def format_duration(seconds):
+    if seconds < 60:
+        return f"{seconds:.0f} s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def format_size(size):
+    if size < 1024 ** 3:
+        return f"{size / 1024 ** 2:.0f} MB"
+    return f"{size / 1024 ** 3:.1f} GB"
+
+
+def format_estimate(estimate):
+    """Return a short human-readable summary of a BatchEstimate."""
+    lines = [f"{estimate.files} files, {format_duration(estimate.audio_seconds)} of audio"]
+    if estimate.pending_files < estimate.files:
+        lines[0] += f" ({estimate.files - estimate.pending_files} already converted)"
+    lines.append(f"Output size: about {format_size(estimate.output_bytes)}")
+    lines.append(f"Encoding: about {format_duration(estimate.encode_seconds)} "
+                 f"on {estimate.workers} worker{'s' if estimate.workers != 1 else ''}")
+    upload = (f"Upload: about {format_duration(estimate.upload_seconds)} at "
+              f"{estimate.upload_bytes_per_second / 1024 ** 2:.1f} MB/s")
+    if not estimate.upload_measured:
+        upload += " (assumed; no uploads measured yet)"
+    lines.append(upload)
+    lines.append(f"Google Sheets API calls: about {estimate.sheets_calls}")
+    return "\n".join(lines)
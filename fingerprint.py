@@ -0,0 +1,204 @@
+import logging
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from metrics import get_recorder
+from pcm_reader import open_pcm, to_mono_float
+from silence import DEFAULT_THRESHOLD_DB
+
+logger = logging.getLogger(__name__)
+
+# Audio is box-filtered and decimated to roughly this rate before analysis
+TARGET_RATE = 5512
+# Only the start of each recording is fingerprinted; durations are compared separately
+MAX_FINGERPRINT_SECONDS = 600
+# FFT frame size at the decimated rate (~0.37 s per frame)
+FRAME_SIZE = 2048
+# 33 log-spaced bands give 32 energy-difference bits per frame
+BAND_EDGES_HZ = np.geomspace(300, 2000, 34)
+# Frames read from the memory map per block, before decimation
+BLOCK_FRAMES = 1 << 20
+
+# Two recordings are duplicates when their lengths agree this closely...
+DURATION_TOLERANCE = 0.02
+DURATION_TOLERANCE_SECONDS = 1.0
+# ...and at most this fraction of fingerprint bits differ
+MAX_BIT_ERROR_RATE = 0.2
+# Alignment offsets (in frames) tried when comparing fingerprints
+MAX_OFFSET_FRAMES = 8
+# Frames quieter than this have no spectral shape to compare and are left out
+SILENCE_FLOOR_DB = DEFAULT_THRESHOLD_DB
+# Recordings are only compared over at least this many non-silent frames (~12 s)
+MIN_MATCH_FRAMES = 32
+# Bumped whenever compute_fingerprint changes, so stored fingerprints are recomputed
+FINGERPRINT_VERSION = 2
+
+
+def read_decimated(file_path, target_rate=TARGET_RATE, max_seconds=MAX_FINGERPRINT_SECONDS):
+    """Read the start of a WAV file as mono float32 PCM decimated to about `target_rate`.
+
+    The file is memory-mapped and processed in fixed-size blocks, so memory use
+    does not grow with the length of the recording.
+    """
+    info, data, scale = open_pcm(file_path)
+    factor = max(1, info.sample_rate // target_rate)
+    frames = min(len(data), int(max_seconds * info.sample_rate))
+    frames -= frames % factor
+    block_frames = BLOCK_FRAMES - BLOCK_FRAMES % factor
+
+    output = np.empty(frames // factor, dtype=np.float32)
+    for start in range(0, frames, block_frames):
+        end = min(start + block_frames, frames)
+        mono = to_mono_float(data[start:end], info, scale)
+        # Averaging each group of `factor` samples is a cheap low-pass before decimation
+        output[start // factor:end // factor] = mono.reshape(-1, factor).mean(axis=1)
+    return output, info.sample_rate / factor, info.duration
+
+
+def compute_fingerprint(samples, rate):
+    """Return a compact spectral fingerprint: one uint32 of band-energy difference bits per frame.
+
+    Silent frames are dropped first. Their bits would all be zero, so any two
+    silent stretches would look identical.
+    """
+    frame_count = len(samples) // FRAME_SIZE
+    if frame_count < 2:
+        return np.zeros(0, dtype=np.uint32)
+
+    frames = samples[:frame_count * FRAME_SIZE].reshape(frame_count, FRAME_SIZE)
+    frames = frames[np.mean(np.square(frames), axis=1) >= 10 ** (SILENCE_FLOOR_DB / 10)]
+    if len(frames) < 2:
+        return np.zeros(0, dtype=np.uint32)
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(FRAME_SIZE).astype(np.float32), axis=1)) ** 2
+
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1.0 / rate)
+    band = np.digitize(freqs, BAND_EDGES_HZ) - 1
+    band_matrix = np.zeros((len(freqs), len(BAND_EDGES_HZ) - 1), dtype=np.float32)
+    in_range = (band >= 0) & (band < band_matrix.shape[1])
+    band_matrix[np.nonzero(in_range)[0], band[in_range]] = 1.0
+    energies = spectrum @ band_matrix
+
+    # Sign of the change over time of the difference between neighbouring bands
+    band_diff = energies[:, :-1] - energies[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    return np.packbits(bits, axis=1, bitorder='little').view('<u4').ravel()
+
+
+def bit_error_rate(a, b, max_offset=MAX_OFFSET_FRAMES):
+    """Return the lowest fraction of differing bits between two fingerprints over small offsets."""
+    best = 1.0
+    for offset in range(-max_offset, max_offset + 1):
+        x = a[max(offset, 0):]
+        y = b[max(-offset, 0):]
+        length = min(len(x), len(y))
+        if length < MIN_MATCH_FRAMES:
+            continue
+        differing = np.unpackbits((x[:length] ^ y[:length]).view(np.uint8)).sum()
+        best = min(best, differing / (length * 32))
+    return best
+
+
+class FingerprintIndex:
+    """Persistent SQLite index of source fingerprints, keyed by path, size and mtime."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        try:
+            self.conn = sqlite3.connect(db_path, check_same_thread=False)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    source_path TEXT PRIMARY KEY,
+                    source_size INTEGER NOT NULL,
+                    source_mtime REAL NOT NULL,
+                    duration REAL NOT NULL,
+                    fingerprint BLOB NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS fingerprints_duration ON fingerprints (duration);
+            """)
+            # Indexes created before fingerprints were versioned lack the column
+            columns = {row[1] for row in self.conn.execute('PRAGMA table_info(fingerprints)')}
+            if 'version' not in columns:
+                self.conn.execute('ALTER TABLE fingerprints ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+        except sqlite3.Error as e:
+            raise Exception(f"Failed to open fingerprint index at {db_path}: {str(e)}")
+
+    def get_fingerprint(self, file_path):
+        """Return (duration, fingerprint) for a file, computing and storing it if needed."""
+        stat = os.stat(file_path)
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT source_size, source_mtime, duration, fingerprint, version FROM fingerprints '
+                'WHERE source_path = ?', (file_path,)
+            ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime and row[4] == FINGERPRINT_VERSION:
+            return row[2], np.frombuffer(row[3], dtype='<u4')
+
+        with get_recorder().span('fingerprint', file=file_path) as span:
+            samples, rate, duration = read_decimated(file_path)
+            fingerprint = compute_fingerprint(samples, rate)
+            span.audio_seconds = len(samples) / rate if rate else None
+            if duration and span.audio_seconds:
+                # Only the fingerprinted part of the file was read
+                span.bytes = min(stat.st_size, int(stat.st_size * span.audio_seconds / duration))
+
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO fingerprints '
+                '(source_path, source_size, source_mtime, duration, fingerprint, version) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (file_path, stat.st_size, stat.st_mtime, duration, fingerprint.tobytes(), FINGERPRINT_VERSION)
+            )
+            self.conn.commit()
+        return duration, fingerprint
+
+    def candidates(self, duration, exclude_path):
+        """Return (path, fingerprint) for indexed recordings of about the same duration."""
+        tolerance = max(duration * DURATION_TOLERANCE, DURATION_TOLERANCE_SECONDS)
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT source_path, fingerprint FROM fingerprints '
+                'WHERE duration BETWEEN ? AND ? AND source_path != ? AND version = ?',
+                (duration - tolerance, duration + tolerance, exclude_path, FINGERPRINT_VERSION)
+            ).fetchall()
+        return [(path, np.frombuffer(blob, dtype='<u4')) for path, blob in rows]
+
+    def find_duplicates(self, source_files):
+        """Flag sources that duplicate another source in the batch or an earlier recording.
+
+        Returns:
+            Dict mapping each duplicate's path to the path of the recording it duplicates.
+            Within a batch the first occurrence is kept and later ones are flagged.
+        """
+        duplicates = {}
+        seen = set()
+        batch = set(source_files)
+        for file_path in source_files:
+            try:
+                duration, fingerprint = self.get_fingerprint(file_path)
+            except Exception as e:
+                logger.warning(f"Could not fingerprint {file_path}: {str(e)}")
+                continue
+            # Mostly silent recordings don't leave enough to tell them apart
+            if len(fingerprint) >= MIN_MATCH_FRAMES:
+                for other_path, other in self.candidates(duration, file_path):
+                    # Ignore earlier recordings that no longer exist, and later batch entries
+                    if other_path in duplicates:
+                        continue
+                    if other_path not in seen and (other_path in batch or not os.path.exists(other_path)):
+                        continue
+                    if bit_error_rate(fingerprint, other) <= MAX_BIT_ERROR_RATE:
+                        duplicates[file_path] = other_path
+                        break
+            seen.add(file_path)
+        return duplicates
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -1,16 +1,57 @@
+import itertools
+import logging
 import os
-import pickle
+import re
+import socket
 import sys
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
+import threading
+import time
+from collections import namedtuple
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaFileUpload
+from credential_store import CredentialManager
+from metrics import get_recorder
 
-class GoogleServices:
-    def __init__(self):
-        """Initialize the Google Services."""
-        try:
+logger = logging.getLogger(__name__)
+
+# Retry budget for a single upload chunk before the upload is abandoned
+UPLOAD_CHUNK_RETRIES = 5
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+# Largest page files().list accepts; fewer round trips for folders with many children
+FOLDER_PAGE_SIZE = 1000
+
+# Drive accepts at most 100 calls per batch request
+BATCH_SIZE = 100
+# Rounds of resending batched calls that failed transiently
+BATCH_RETRIES = 3
+
+# Matches season numbers in names like "Show S02E05" or "Show Season 2 Episode 5"
+SEASON_PATTERN = re.compile(r'(?<![a-z0-9])(?:s(\d{1,2})[ ._-]?e\d{1,3}|season[ ._-]?(\d{1,2}))(?![0-9])',
+                            re.IGNORECASE)
+
+
+def escape_query(value):
+    """Escape a value for use inside a quoted Drive query string."""
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+
+SCOPES = [
+    'https://www.googleapis.com/auth/drive',
+    'https://www.googleapis.com/auth/spreadsheets'
+]
+
+_credential_manager = None
+_credential_manager_lock = threading.Lock()
+
+
+def get_credential_manager():
+    """Return the process-wide credential manager, creating it on first use."""
+    global _credential_manager
+    with _credential_manager_lock:
+        if _credential_manager is None:
             # Get the directory where the executable/script is located
             if getattr(sys, 'frozen', False):
                 # If the application is run as a bundle (exe)
@@ -23,100 +64,188 @@ class GoogleServices:
 
             # Set up paths for credentials and token
             credentials_path = os.path.join(application_path, 'credentials.json')
-            token_path = os.path.join(working_dir, 'token.pickle')
-
-            print(f"Credentials path: {credentials_path}")
-            print(f"Token path: {token_path}")
-
-            self.scopes = [
-                'https://www.googleapis.com/auth/drive',
-                'https://www.googleapis.com/auth/spreadsheets'
-            ]
-
-            self.creds = None
-
-            # Check if token.pickle exists and is valid
-            if os.path.exists(token_path):
-                try:
-                    with open(token_path, 'rb') as token:
-                        self.creds = pickle.load(token)
-                    print("Loaded existing token")
-                except Exception as e:
-                    print(f"Error loading token: {str(e)}")
-                    self.creds = None
-
-            # If no valid credentials available, let the user log in
-            if not self.creds or not self.creds.valid:
-                if self.creds and self.creds.expired and self.creds.refresh_token:
-                    print("Token expired, refreshing...")
-                    try:
-                        self.creds.refresh(Request())
-                        print("Token refreshed successfully")
-                    except Exception as e:
-                        print(f"Error refreshing token: {str(e)}")
-                        self.creds = None
-
-                if not self.creds:
-                    print("No valid credentials, starting OAuth flow...")
-                    if not os.path.exists(credentials_path):
-                        raise FileNotFoundError(
-                            f"credentials.json not found at {credentials_path}. Please ensure it exists in the same directory as the application."
-                        )
-                    try:
-                        flow = InstalledAppFlow.from_client_secrets_file(credentials_path, self.scopes)
-                        self.creds = flow.run_local_server(port=0)
-                        print("OAuth flow completed successfully")
-                    except Exception as e:
-                        raise Exception(f"Failed to complete OAuth flow: {str(e)}")
-
-                # Save the credentials for the next run
-                try:
-                    with open(token_path, 'wb') as token:
-                        pickle.dump(self.creds, token)
-                    print(f"Saved new token to {token_path}")
-                except Exception as e:
-                    print(f"Warning: Could not save token: {str(e)}")
+            token_path = os.path.join(working_dir, 'token.json')
+
+            logger.debug(f"Credentials path: {credentials_path}")
+            logger.debug(f"Token path: {token_path}")
+
+            legacy_token_path = os.path.join(working_dir, 'token.pickle')
+            if os.path.exists(legacy_token_path) and not os.path.exists(token_path):
+                # Pickled tokens are no longer loaded; sign in once more to create token.json
+                logger.info(f"Ignoring legacy token at {legacy_token_path}")
+
+            _credential_manager = CredentialManager(credentials_path, token_path, SCOPES)
+        return _credential_manager
+
+
+def season_folder_name(filename):
+    """Return "Season N" for episode filenames that carry a season number, else None."""
+    match = SEASON_PATTERN.search(filename)
+    if not match:
+        return None
+    return f"Season {int(match.group(1) or match.group(2))}"
+
+
+# Outcome of one batched call: `response` on success, `error` (a string) on failure
+BatchResult = namedtuple('BatchResult', ['key', 'response', 'error'])
+
+
+class DriveBatch:
+    """Queues small Drive metadata calls and sends them through the batch endpoint.
+
+    Calls are sent in groups of `batch_size` as the queue fills, and the rest on
+    flush(). Calls that fail with a retryable status are resent in a later group.
+    Sending never raises: if a whole batch request fails, each of its calls gets
+    a BatchResult carrying the error.
+
+    Args:
+        drive_service: Drive v3 client
+        batch_size: Calls per batch request (Drive allows at most 100)
+    """
+
+    def __init__(self, drive_service, batch_size=BATCH_SIZE):
+        self.drive_service = drive_service
+        self.batch_size = batch_size
+        self._pending = []  # (index, key, request)
+        self._results = []
+
+    def add(self, request, key=None):
+        """Queue an API request; its BatchResult is tagged with `key`."""
+        self._pending.append((len(self._results) + len(self._pending), key, request))
+        if len(self._pending) >= self.batch_size:
+            calls, self._pending = self._pending, []
+            self._send(calls)
+
+    def share_with_link(self, file_id, role='reader', key=None):
+        """Queue a permission that lets anyone with the link open the file."""
+        self.add(self.drive_service.permissions().create(
+            fileId=file_id,
+            body={'type': 'anyone', 'role': role},
+            fields='id',
+            supportsAllDrives=True
+        ), key)
+
+    def update_file(self, file_id, key=None, **metadata):
+        """Queue a metadata update such as description or appProperties."""
+        self.add(self.drive_service.files().update(
+            fileId=file_id,
+            body=metadata,
+            fields='id',
+            supportsAllDrives=True
+        ), key)
+
+    def create_folder(self, name, parent_id, key=None):
+        """Queue the creation of a folder."""
+        self.add(self.drive_service.files().create(
+            body={'name': name, 'mimeType': FOLDER_MIME_TYPE, 'parents': [parent_id]},
+            fields='id, name',
+            supportsAllDrives=True
+        ), key)
+
+    def flush(self):
+        """Send everything still queued and return every call's BatchResult in queue order."""
+        if self._pending:
+            calls, self._pending = self._pending, []
+            self._send(calls)
+        results = [result for _, result in sorted(self._results, key=lambda r: r[0])]
+        self._results = []
+        return results
+
+    def _send(self, calls):
+        for attempt in range(BATCH_RETRIES + 1):
+            retry = []
+            answered = set()
+
+            def callback(request_id, response, exception, calls=calls):
+                index, key, request = calls[int(request_id)]
+                answered.add(index)
+                if exception is None:
+                    self._results.append((index, BatchResult(key, response, None)))
+                elif (isinstance(exception, HttpError) and exception.resp.status in RETRYABLE_STATUS_CODES
+                        and attempt < BATCH_RETRIES):
+                    retry.append((index, key, request))
+                else:
+                    self._results.append((index, BatchResult(key, None, str(exception))))
+
+            batch = self.drive_service.new_batch_http_request(callback=callback)
+            for request_id, (_, _, request) in enumerate(calls):
+                batch.add(request, request_id=str(request_id))
+            try:
+                with get_recorder().span('drive_batch') as span:
+                    span.retries = attempt
+                    batch.execute()
+            except Exception as e:
+                logger.error(f"Batched Drive request failed: {str(e)}")
+                for index, key, _ in calls:
+                    if index not in answered:
+                        self._results.append((index, BatchResult(key, None, str(e))))
+                return
+
+            if not retry:
+                return
+            logger.warning(f"Resending {len(retry)} batched Drive calls")
+            calls = retry
+            time.sleep(min(2 ** attempt, 30))
+
+
+class GoogleServices:
+    def __init__(self, credential_manager=None):
+        """Initialize the Google Services.
+
+        Args:
+            credential_manager: CredentialManager to use (the shared one if None)
+        """
+        try:
+            self.scopes = SCOPES
+            self.credential_manager = credential_manager or get_credential_manager()
+            self.creds = self.credential_manager.authorize()
+            # Keep the token fresh for the whole session, however long uploads run
+            self.credential_manager.start()
 
             # Create API service instances
             try:
-                self.drive_service = build('drive', 'v3', credentials=self.creds)
-                self.sheets_service = build('sheets', 'v4', credentials=self.creds)
-                print("Successfully created API service instances")
+                self.drive_service, self.sheets_service = self._build_services()
+                logger.info("Successfully created API service instances")
             except Exception as e:
                 raise Exception(f"Failed to create API services: {str(e)}")
 
         except Exception as e:
             raise Exception(f"Failed to initialize Google Services: {str(e)}")
 
-    def initialize_credentials(self):
-        """Authenticate with Google services."""
-        if os.path.exists('token.pickle'):
-            try:
-                with open('token.pickle', 'rb') as token:
-                    self.creds = pickle.load(token)
-            except:
-                if os.path.exists('token.pickle'):
-                    os.remove('token.pickle')
-                self.creds = None
-
-        if not self.creds or not self.creds.valid:
-            if self.creds and self.creds.expired and self.creds.refresh_token:
-                try:
-                    self.creds.refresh(Request())
-                except:
-                    if os.path.exists('token.pickle'):
-                        os.remove('token.pickle')
-                    self.creds = None
-                    flow = InstalledAppFlow.from_client_secrets_file(
-                        'credentials.json', self.scopes)
-                    self.creds = flow.run_local_server(port=0)
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    'credentials.json', self.scopes)
-                self.creds = flow.run_local_server(port=0)
-            
-            with open('token.pickle', 'wb') as token:
-                pickle.dump(self.creds, token)
+    def _build_services(self):
+        """Build Drive and Sheets clients, each on its own transport over the shared credentials."""
+        drive_service = build('drive', 'v3', http=self.credential_manager.authorized_http())
+        sheets_service = build('sheets', 'v4', http=self.credential_manager.authorized_http())
+        return drive_service, sheets_service
+
+    @classmethod
+    def from_services(cls, drive_service, sheets_service):
+        """Create an instance around already-built Drive and Sheets clients.
+
+        Skips the OAuth flow entirely; used by the benchmarks to talk to a local
+        stand-in for the Google APIs.
+        """
+        services = cls.__new__(cls)
+        services.scopes = []
+        services.creds = None
+        services.credential_manager = None
+        services.drive_service = drive_service
+        services.sheets_service = sheets_service
+        return services
+
+    def clone(self):
+        """Return an instance with its own HTTP transports, for use from another thread.
+
+        The clone shares this instance's credentials, so background token
+        refreshes apply to both.
+        """
+        if self.credential_manager is None:
+            return self
+        services = GoogleServices.from_services(*self._build_services())
+        services.scopes = self.scopes
+        services.creds = self.creds
+        services.credential_manager = self.credential_manager
+        return services
 
     def upload_to_drive(self, file_path, folder_id, progress_callback=None):
         """Upload a file to Google Drive in the specified folder."""
@@ -140,14 +269,17 @@ class GoogleServices:
             request = self.drive_service.files().create(
                 body=file_metadata,
                 media_body=media,
-                fields='id, webViewLink'
+                fields='id, webViewLink',
+                supportsAllDrives=True  # The target folder may be on a shared drive
             )
             
             # Upload the file in chunks and track progress
             response = None
             uploaded_bytes = 0
             while response is None:
-                status, response = request.next_chunk()
+                with get_recorder().span('upload_chunk', file=file_path) as span:
+                    status, response = self._next_chunk(request, span)
+                    span.bytes = (status.resumable_progress if status else file_size) - uploaded_bytes
                 if status:
                     uploaded_bytes = status.resumable_progress
                     if progress_callback:
@@ -164,6 +296,27 @@ class GoogleServices:
         except Exception as e:
             raise Exception(f"Error uploading file: {str(e)}")
 
+    def _next_chunk(self, request, span):
+        """Send the next upload chunk, retrying transient failures with backoff."""
+        return self._retry(request.next_chunk, span)
+
+    def _execute(self, request, span):
+        """Execute an API request, retrying transient failures with backoff."""
+        return self._retry(request.execute, span)
+
+    def _retry(self, call, span):
+        for attempt in range(UPLOAD_CHUNK_RETRIES + 1):
+            try:
+                return call()
+            except HttpError as e:
+                if e.resp.status not in RETRYABLE_STATUS_CODES or attempt == UPLOAD_CHUNK_RETRIES:
+                    raise
+            except (ConnectionError, socket.timeout):
+                if attempt == UPLOAD_CHUNK_RETRIES:
+                    raise
+            span.retries += 1
+            time.sleep(min(2 ** attempt, 30))
+
     def update_spreadsheet(self, spreadsheet_id, range_name, values, unmatched_handler=None):
         """Update the spreadsheet with file links.
         
@@ -172,62 +325,73 @@ class GoogleServices:
             range_name: The range in A1 notation (e.g., 'Sheet1!A:B')
             values: List of [filename, link] pairs
             unmatched_handler: Callback function for handling unmatched files
+
+        Returns:
+            Dict mapping each documented filename to its spreadsheet row
         """
         try:
-            print(f"Starting spreadsheet update with ID: {spreadsheet_id}")
+            logger.info(f"Starting spreadsheet update with ID: {spreadsheet_id}")
             sheet_name = range_name.split('!')[0]
             
             # Get existing data starting from row 4
-            result = self.sheets_service.spreadsheets().values().get(
-                spreadsheetId=spreadsheet_id,
-                range=f"{sheet_name}!A4:B"
-            ).execute()
+            with get_recorder().span('sheets_read') as span:
+                result = self._execute(self.sheets_service.spreadsheets().values().get(
+                    spreadsheetId=spreadsheet_id,
+                    range=f"{sheet_name}!A4:B"
+                ), span)
             
             existing_rows = result.get('values', [])
-            print(f"Found {len(existing_rows)} existing rows")
-            updated_rows = []  # Track which rows were updated
+            logger.info(f"Found {len(existing_rows)} existing rows")
+            updated_rows = {}  # Track which row each file was written to
             unmatched_files = []  # Track files without exact matches
             
+            # Index existing filenames once (case-insensitive, first occurrence wins)
+            # instead of scanning every row for every file
+            row_index = {}
+            for i, row in enumerate(existing_rows):
+                if not row:  # Skip empty rows
+                    continue
+                row_index.setdefault(row[0].lower(), i)
+
+            # Only build per-file debug messages when DEBUG is enabled for this module
+            debug = logger.isEnabledFor(logging.DEBUG)
+            
             # Process each new file
             for filename, link in values:
-                print(f"Processing file: {filename}")
+                if debug:
+                    logger.debug(f"Processing file: {filename}")
                 # Create a hyperlink formula with filename as the display text
                 display_name = os.path.splitext(os.path.basename(filename))[0]  # Remove extension if present
                 hyperlink_formula = f'=HYPERLINK("{link}","{display_name}.mp3")'
                 found_match = False
                 
-                # Look for exact matching filename in existing rows
-                for i, row in enumerate(existing_rows):
-                    if not row:  # Skip empty rows
-                        continue
-                    
-                    existing_filename = row[0] if row else ""
-                    print(f"Comparing with existing: {existing_filename}")
-                    # Check for exact match (case-insensitive)
-                    if filename.lower() == existing_filename.lower():
-                        print(f"Found match at row {i+4}")
-                        # Update the link in column B with hyperlink formula
-                        update_range = f"{sheet_name}!B{i+4}"
-                        self.sheets_service.spreadsheets().values().update(
+                # Look for exact matching filename in existing rows (case-insensitive)
+                i = row_index.get(filename.lower())
+                if i is not None:
+                    if debug:
+                        logger.debug(f"Found match at row {i+4}")
+                    # Update the link in column B with hyperlink formula
+                    update_range = f"{sheet_name}!B{i+4}"
+                    with get_recorder().span('sheets_write', file=filename) as span:
+                        self._execute(self.sheets_service.spreadsheets().values().update(
                             spreadsheetId=spreadsheet_id,
                             range=update_range,
                             valueInputOption='USER_ENTERED',
                             body={'values': [[hyperlink_formula]]}
-                        ).execute()
-                        updated_rows.append(i+4)
-                        found_match = True
-                        break
-                
+                        ), span)
+                    updated_rows[filename] = i+4
+                    found_match = True
+
                 if not found_match:
-                    print(f"No match found for: {filename}")
+                    logger.info(f"No match found for: {filename}")
                     unmatched_files.append([filename, hyperlink_formula])
             
             # If we have unmatched files and a handler function
             if unmatched_files and unmatched_handler:
-                print(f"Found {len(unmatched_files)} unmatched files")
+                logger.info(f"Found {len(unmatched_files)} unmatched files")
                 # Ask user what to do with unmatched files
                 if unmatched_handler(unmatched_files):
-                    print("User chose to create new entries")
+                    logger.info("User chose to create new entries")
                     # Find the first empty row after row 4 or after the last existing row
                     next_row = 4
                     if existing_rows:
@@ -238,37 +402,113 @@ class GoogleServices:
                                 last_row = i
                         next_row = last_row + 1
                     
-                    print(f"Adding new entries starting at row {next_row}")
+                    logger.info(f"Adding new entries starting at row {next_row}")
                     # Add new values with hyperlink formulas
                     update_range = f"{sheet_name}!A{next_row}"
-                    result = self.sheets_service.spreadsheets().values().update(
-                        spreadsheetId=spreadsheet_id,
-                        range=update_range,
-                        valueInputOption='USER_ENTERED',
-                        body={'values': unmatched_files}
-                    ).execute()
-                    print(f"Update result: {result}")
+                    with get_recorder().span('sheets_write') as span:
+                        result = self._execute(self.sheets_service.spreadsheets().values().update(
+                            spreadsheetId=spreadsheet_id,
+                            range=update_range,
+                            valueInputOption='USER_ENTERED',
+                            body={'values': unmatched_files}
+                        ), span)
+                    logger.debug(f"Update result: {result}")
+                    for offset, (filename, _) in enumerate(unmatched_files):
+                        updated_rows[filename] = next_row + offset
             
-            return True
+            return updated_rows
             
         except Exception as e:
-            print(f"Error in update_spreadsheet: {str(e)}")
+            logger.error(f"Error in update_spreadsheet: {str(e)}")
             raise Exception(f"Error updating spreadsheet: {str(e)}")
 
-    def get_folder_list(self):
-        """Get list of folders from Google Drive."""
+    def get_sheet_values(self, spreadsheet_id, sheet_name):
+        """Read every row of a sheet in one call.
+
+        Values are unformatted and dates come back as serial numbers, so the
+        result doesn't depend on the sheet's number and date formats.
+        """
         try:
-            results = self.drive_service.files().list(
-                q="mimeType='application/vnd.google-apps.folder' and trashed=false",
-                spaces='drive',
-                fields='files(id, name)',
-                pageSize=100
-            ).execute()
-            
-            return sorted(results.get('files', []), key=lambda x: x.get('name', '').lower())
+            quoted_name = "'" + sheet_name.replace("'", "''") + "'"
+            with get_recorder().span('sheets_read') as span:
+                result = self._execute(self.sheets_service.spreadsheets().values().get(
+                    spreadsheetId=spreadsheet_id,
+                    range=quoted_name,
+                    valueRenderOption='UNFORMATTED_VALUE',
+                    dateTimeRenderOption='SERIAL_NUMBER'
+                ), span)
+            return result.get('values', [])
+        except Exception as e:
+            raise Exception(f"Error reading sheet {sheet_name}: {str(e)}")
+
+    def iter_folders(self, query):
+        """Yield folders matching a Drive query, following result pages lazily."""
+        page_token = None
+        while True:
+            with get_recorder().span('drive_list'):
+                results = self.drive_service.files().list(
+                    q=f"mimeType='{FOLDER_MIME_TYPE}' and trashed=false and ({query})",
+                    fields='nextPageToken, files(id, name, parents)',
+                    orderBy='name',
+                    pageSize=FOLDER_PAGE_SIZE,
+                    pageToken=page_token,
+                    corpora='allDrives',
+                    includeItemsFromAllDrives=True,
+                    supportsAllDrives=True
+                ).execute()
+            yield from results.get('files', [])
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return
+
+    def get_child_folders(self, parent_id):
+        """Get the folders directly inside a folder or shared drive ('root' for My Drive)."""
+        try:
+            return list(self.iter_folders(f"'{escape_query(parent_id)}' in parents"))
+        except Exception as e:
+            raise Exception(f"Error listing folders: {str(e)}")
+
+    def search_folders(self, name, limit=100):
+        """Find folders whose name contains `name`, searched server-side."""
+        try:
+            folders = self.iter_folders(f"name contains '{escape_query(name)}'")
+            return list(itertools.islice(folders, limit))
+        except Exception as e:
+            raise Exception(f"Error searching folders: {str(e)}")
+
+    def ensure_subfolders(self, parent_id, names):
+        """Return {name: folder_id} for subfolders of a folder, creating missing ones in one batch."""
+        try:
+            folders = {f['name']: f['id'] for f in self.get_child_folders(parent_id)}
+            batch = DriveBatch(self.drive_service)
+            for name in sorted(set(names) - set(folders)):
+                batch.create_folder(name, parent_id, key=name)
+            for result in batch.flush():
+                if result.error:
+                    raise Exception(f"could not create {result.key}: {result.error}")
+                folders[result.key] = result.response['id']
+            return folders
+        except Exception as e:
+            raise Exception(f"Error creating subfolders: {str(e)}")
+
+    def get_shared_drives(self):
+        """Get the shared drives the account can see."""
+        drives = []
+        page_token = None
+        try:
+            while True:
+                results = self.drive_service.drives().list(
+                    fields='nextPageToken, drives(id, name)',
+                    pageSize=100,
+                    pageToken=page_token
+                ).execute()
+                drives.extend(results.get('drives', []))
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    return sorted(drives, key=lambda x: x.get('name', '').lower())
         except Exception as e:
-            print(f"Error getting folder list: {str(e)}")
-            return []
+            logger.error(f"Error getting shared drives: {str(e)}")
+            return drives
 
     def get_spreadsheet_list(self):
         """Get list of spreadsheets from Google Drive."""
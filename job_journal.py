@@ -0,0 +1,206 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from metrics import get_recorder
+
+# Pipeline stages in the order a file moves through them
+STAGE_PENDING = 'pending'
+STAGE_CONVERTED = 'converted'
+STAGE_UPLOADED = 'uploaded'
+STAGE_POST_PROCESSED = 'post_processed'  # Drive sharing and metadata calls succeeded
+STAGE_DOCUMENTED = 'documented'
+STAGES = [STAGE_PENDING, STAGE_CONVERTED, STAGE_UPLOADED, STAGE_POST_PROCESSED, STAGE_DOCUMENTED]
+
+# Columns that callers are allowed to set through record()
+JOB_FIELDS = ['content_hash', 'source_size', 'source_mtime', 'output_path',
+              'profile_key', 'drive_file_id', 'drive_folder_id', 'web_link',
+              'spreadsheet_id', 'sheet_range', 'sheet_row']
+
+# Fields that belong to later stages and are invalidated by a fresh conversion
+DOWNSTREAM_FIELDS = {
+    STAGE_CONVERTED: ['drive_file_id', 'drive_folder_id', 'web_link', 'spreadsheet_id', 'sheet_range', 'sheet_row'],
+    STAGE_UPLOADED: ['spreadsheet_id', 'sheet_range', 'sheet_row'],
+}
+
+# Columns added after the first release, created on older journals when they are opened
+ADDED_COLUMNS = {
+    'profile_key': 'TEXT',
+    'drive_folder_id': 'TEXT',
+    'spreadsheet_id': 'TEXT',
+    'sheet_range': 'TEXT',
+}
+
+
+def hash_file(file_path, chunk_size=1024*1024):
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with get_recorder().span('hash', file=file_path) as span:
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+                span.bytes += len(chunk)
+    return digest.hexdigest()
+
+
+class JobJournal:
+    """Durable record of each file's progress through convert, upload and documentation.
+
+    Upload and documentation entries store where the file went (Drive folder,
+    spreadsheet and range), so a later run aimed elsewhere doesn't skip it.
+
+    The journal lives in a SQLite database in WAL mode. Transitions are queued in
+    memory and written in a single transaction once `batch_size` records are pending,
+    or immediately when a caller marks a record as durable (e.g. after a Drive upload,
+    where losing the file ID would mean creating a duplicate on the next run).
+    """
+
+    def __init__(self, db_path, batch_size=50):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self._pending = []
+        self._lock = threading.Lock()
+
+        try:
+            self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self.conn.row_factory = sqlite3.Row
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    source_path TEXT PRIMARY KEY,
+                    content_hash TEXT,
+                    source_size INTEGER,
+                    source_mtime REAL,
+                    stage TEXT NOT NULL,
+                    output_path TEXT,
+                    profile_key TEXT,
+                    drive_file_id TEXT,
+                    drive_folder_id TEXT,
+                    web_link TEXT,
+                    spreadsheet_id TEXT,
+                    sheet_range TEXT,
+                    sheet_row INTEGER,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_output_path ON jobs (output_path);
+                CREATE TABLE IF NOT EXISTS transitions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    source_path TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    recorded_at REAL NOT NULL
+                );
+            """)
+            columns = {row[1] for row in self.conn.execute('PRAGMA table_info(jobs)')}
+            for column, column_type in ADDED_COLUMNS.items():
+                if column not in columns:
+                    self.conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {column_type}')
+        except sqlite3.Error as e:
+            raise Exception(f"Failed to open job journal at {db_path}: {str(e)}")
+
+    def content_hash(self, file_path):
+        """Return the content hash of a source file.
+
+        The stored hash is reused when the file's size and modification time are
+        unchanged, so re-running a batch does not re-read every source.
+        """
+        return self.cached_hash(file_path) or hash_file(file_path)
+
+    def cached_hash(self, file_path):
+        """Return the stored content hash if the file's size and mtime are unchanged, else None."""
+        stat = os.stat(file_path)
+        job = self.get(file_path)
+        if (job and job['content_hash'] and job['source_size'] == stat.st_size
+                and job['source_mtime'] == stat.st_mtime):
+            return job['content_hash']
+        return None
+
+    def get(self, source_path):
+        """Return the journal entry for a source file as a dict, or None.
+
+        Transitions that are still queued are applied on top of the stored row,
+        so lookups never force a flush.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT * FROM jobs WHERE source_path = ?', (source_path,)
+            ).fetchone()
+            job = dict(row) if row else None
+            for path, stage, fields, recorded_at in self._pending:
+                if path != source_path:
+                    continue
+                if job is None:
+                    job = {'source_path': path, **{f: None for f in JOB_FIELDS}}
+                job.update(fields, stage=stage, updated_at=recorded_at)
+        return job
+
+    def reached(self, source_path, stage, content_hash=None):
+        """Return the journal entry if the file has reached `stage` with the same content."""
+        job = self.get(source_path)
+        if not job:
+            return None
+        if content_hash and job['content_hash'] != content_hash:
+            return None
+        if STAGES.index(job['stage']) < STAGES.index(stage):
+            return None
+        return job
+
+    def record(self, source_path, stage, durable=False, **fields):
+        """Queue a stage transition for a source file.
+
+        Args:
+            source_path: Path of the source WAV file
+            stage: One of STAGES
+            durable: Write the transition (and anything queued before it) immediately
+            **fields: Any of JOB_FIELDS to store alongside the transition
+        """
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage: {stage}")
+        unknown = set(fields) - set(JOB_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown journal fields: {', '.join(sorted(unknown))}")
+
+        for field in DOWNSTREAM_FIELDS.get(stage, []):
+            fields.setdefault(field, None)
+
+        with self._lock:
+            self._pending.append((source_path, stage, fields, time.time()))
+            should_flush = durable or len(self._pending) >= self.batch_size
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """Write all queued transitions in a single transaction."""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            try:
+                self.conn.execute('BEGIN')
+                for source_path, stage, fields, recorded_at in pending:
+                    columns = ['source_path', 'stage', 'updated_at'] + list(fields)
+                    updates = ', '.join(f"{c} = excluded.{c}" for c in columns[1:])
+                    self.conn.execute(
+                        f"INSERT INTO jobs ({', '.join(columns)}) "
+                        f"VALUES ({', '.join('?' for _ in columns)}) "
+                        f"ON CONFLICT(source_path) DO UPDATE SET {updates}",
+                        [source_path, stage, recorded_at] + list(fields.values())
+                    )
+                self.conn.executemany(
+                    'INSERT INTO transitions (source_path, stage, recorded_at) VALUES (?, ?, ?)',
+                    [(p[0], p[1], p[3]) for p in pending]
+                )
+                self.conn.execute('COMMIT')
+            except sqlite3.Error as e:
+                self.conn.execute('ROLLBACK')
+                # Keep the transitions so a later flush can retry them
+                self._pending = pending + self._pending
+                raise Exception(f"Error writing job journal: {str(e)}")
+
+    def close(self):
+        """Flush pending transitions and close the database."""
+        self.flush()
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,100 @@
+import atexit
+import json
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FILE_NAME = 'podcast_uploader.log'
+
+# Rotate the log at 5 MB and keep five old files
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# Per-module levels, overridable with e.g.
+# PODCAST_UPLOADER_LOG_LEVELS="google_services=DEBUG,job_journal=WARNING"
+LOG_LEVELS_ENV_VAR = 'PODCAST_UPLOADER_LOG_LEVELS'
+DEFAULT_LOG_LEVELS = {
+    'root': logging.INFO,
+    'googleapiclient.discovery_cache': logging.ERROR,
+    'urllib3': logging.WARNING,
+}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def parse_log_levels(spec):
+    """Parse a "module=LEVEL,module=LEVEL" string into a dict of logger levels."""
+    levels = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        name, level = item.split('=', 1)
+        level = logging.getLevelName(level.strip().upper())
+        if isinstance(level, int):
+            levels[name.strip()] = level
+    return levels
+
+
+def configure_logging(log_dir, levels=None):
+    """Route all logging through a background queue listener.
+
+    Callers only pay for putting a record on a queue; formatting and disk writes
+    happen on the listener thread. The file sink is size-rotated and structured
+    (JSON), the console gets the plain format. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_levels = dict(DEFAULT_LOG_LEVELS)
+    log_levels.update(levels or {})
+    log_levels.update(parse_log_levels(os.environ.get(LOG_LEVELS_ENV_VAR)))
+
+    file_handler = RotatingFileHandler(
+        os.path.join(log_dir, LOG_FILE_NAME),
+        maxBytes=LOG_MAX_BYTES,
+        backupCount=LOG_BACKUP_COUNT,
+        encoding='utf-8'
+    )
+    file_handler.setFormatter(JsonFormatter())
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+
+    for name, level in log_levels.items():
+        logging.getLogger(None if name == 'root' else name).setLevel(level)
+
+    _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Drain the log queue and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import subprocess
+import threading
+import time
+from collections import namedtuple
+
+from metrics import get_recorder
+
+logger = logging.getLogger(__name__)
+
+# Default EBU R128 targets for podcast episodes
+DEFAULT_TARGET_LUFS = -16.0
+DEFAULT_TRUE_PEAK = -1.5
+DEFAULT_LOUDNESS_RANGE = 11.0
+
+# Size of the pieces the source is read in while hashing and measuring
+READ_CHUNK_SIZE = 1024 * 1024
+
+# First-pass loudnorm results; they describe the input only, so they are valid for any target
+LoudnessMeasurement = namedtuple('LoudnessMeasurement', ['input_i', 'input_tp', 'input_lra', 'input_thresh'])
+
+
+def measurement_key(content_hash, trim=None):
+    """Return the cache key for a source's measurement over the (possibly trimmed) region."""
+    if trim:
+        return f"{content_hash}:{trim.start:.3f}-{trim.end:.3f}"
+    return f"{content_hash}:full"
+
+
+def loudnorm_filter(target_lufs, true_peak, loudness_range, measurement=None):
+    """Return the loudnorm filter string for the first (measurement) or second (apply) pass."""
+    options = f"loudnorm=I={target_lufs}:TP={true_peak}:LRA={loudness_range}"
+    if measurement is None:
+        return options + ":print_format=json"
+    # Silent input measures as -inf, which loudnorm rejects; clamp to its accepted ranges
+    measured_i = max(measurement.input_i, -99.0)
+    measured_tp = max(measurement.input_tp, -99.0)
+    measured_lra = min(max(measurement.input_lra, 0.0), 99.0)
+    measured_thresh = max(measurement.input_thresh, -99.0)
+    return (options
+            + f":measured_I={measured_i}:measured_TP={measured_tp}"
+            + f":measured_LRA={measured_lra}:measured_thresh={measured_thresh}"
+            + ":linear=true")
+
+
+def parse_loudnorm_output(stderr):
+    """Extract the first-pass measurement from loudnorm's JSON report on stderr."""
+    blocks = re.findall(r'\{[^{}]*\}', stderr)
+    if not blocks:
+        raise Exception("loudnorm did not report a measurement")
+    report = json.loads(blocks[-1])
+    return LoudnessMeasurement(
+        float(report['input_i']),
+        float(report['input_tp']),
+        float(report['input_lra']),
+        float(report['input_thresh']),
+    )
+
+
+def hash_and_measure(file_path, target_lufs=DEFAULT_TARGET_LUFS, true_peak=DEFAULT_TRUE_PEAK,
+                     loudness_range=DEFAULT_LOUDNESS_RANGE, trim=None):
+    """Hash a source file and run the loudnorm measurement pass from a single read.
+
+    The file is read once; every chunk updates the SHA-256 digest and is piped
+    into an FFmpeg measurement process, so the content hash the job journal needs
+    costs no extra disk I/O.
+
+    Returns:
+        (content_hash, LoudnessMeasurement)
+    """
+    command = ['ffmpeg', '-hide_banner', '-nostats']
+    if trim:
+        command += ['-ss', f"{trim.start:.3f}", '-t', f"{trim.end - trim.start:.3f}"]
+    command += ['-f', 'wav', '-i', 'pipe:0',
+                '-af', loudnorm_filter(target_lufs, true_peak, loudness_range),
+                '-f', 'null', '-']
+
+    digest = hashlib.sha256()
+    with get_recorder().span('loudness_measure', file=file_path) as span:
+        process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        # Drain stderr on a thread so FFmpeg never blocks on a full pipe
+        stderr_chunks = []
+        reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+        reader.start()
+
+        piping = True
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                span.bytes += len(chunk)
+                if piping:
+                    try:
+                        process.stdin.write(chunk)
+                    except (BrokenPipeError, OSError):
+                        # FFmpeg stops reading once a trimmed region has been measured
+                        piping = False
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        process.wait()
+        reader.join()
+
+    stderr = b''.join(stderr_chunks).decode('utf-8', errors='replace')
+    if process.returncode != 0:
+        raise Exception(f"FFmpeg loudness measurement error: {stderr[-2000:]}")
+    return digest.hexdigest(), parse_loudnorm_output(stderr)
+
+
+class LoudnessCache:
+    """SQLite cache of first-pass loudness measurements, keyed by source content hash."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        try:
+            self.conn = sqlite3.connect(db_path, check_same_thread=False)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS loudness (
+                    cache_key TEXT PRIMARY KEY,
+                    input_i REAL NOT NULL,
+                    input_tp REAL NOT NULL,
+                    input_lra REAL NOT NULL,
+                    input_thresh REAL NOT NULL,
+                    measured_at REAL NOT NULL
+                )
+            """)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            raise Exception(f"Failed to open loudness cache at {db_path}: {str(e)}")
+
+    def get(self, key):
+        """Return the cached LoudnessMeasurement for a key, or None."""
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT input_i, input_tp, input_lra, input_thresh FROM loudness WHERE cache_key = ?',
+                (key,)
+            ).fetchone()
+        return LoudnessMeasurement(*row) if row else None
+
+    def put(self, key, measurement):
+        """Store a measurement."""
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO loudness VALUES (?, ?, ?, ?, ?, ?)',
+                (key, *measurement, time.time())
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
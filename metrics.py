@@ -0,0 +1,233 @@
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Set this environment variable to profile a single run of the application
+PROFILE_ENV_VAR = 'PODCAST_UPLOADER_PROFILE'
+# History readers only look at this much of the end of a JSON-lines file
+HISTORY_TAIL_BYTES = 4 * 1024 * 1024
+# Rotate the metrics file at 5 MB and keep five old files, like the log
+METRICS_MAX_BYTES = 5 * 1024 * 1024
+METRICS_BACKUP_COUNT = 5
+
+
+def read_recent_records(jsonl_path, max_bytes=HISTORY_TAIL_BYTES):
+    """Return the records in the last `max_bytes` of a JSON-lines file, oldest first.
+
+    Only the tail is read, so the cost stays flat however long the history
+    gets. When the file is shorter than the tail, the newest rotated file
+    (`<path>.1`) makes up the rest. Lines that don't parse (including one cut
+    off by the tail) are skipped.
+    """
+    with open(jsonl_path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - max_bytes))
+        lines = f.read().split(b'\n')
+    if size > max_bytes:
+        lines = lines[1:]
+
+    records = []
+    backup_path = jsonl_path + '.1'
+    if size < max_bytes and os.path.exists(backup_path):
+        with open(backup_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            backup_size = f.tell()
+            f.seek(max(0, backup_size - (max_bytes - size)))
+            backup_lines = f.read().split(b'\n')
+        lines = backup_lines[1 if backup_size > max_bytes - size else 0:] + lines
+
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+    return records
+
+
+def rotate_file(path, backup_count):
+    """Shift `path` to `path.1`, `path.1` to `path.2` and so on, dropping the oldest."""
+    for index in range(backup_count - 1, 0, -1):
+        source = f"{path}.{index}"
+        if os.path.exists(source):
+            os.replace(source, f"{path}.{index + 1}")
+    if backup_count:
+        os.replace(path, f"{path}.1")
+    else:
+        os.remove(path)
+
+
+class Span:
+    """Timing span for one unit of pipeline work.
+
+    Attributes such as `bytes`, `audio_seconds` and `retries` can be filled in
+    inside the `with` block once they are known.
+    """
+
+    def __init__(self, recorder, stage, file=None, bytes=0, audio_seconds=None,
+                 retries=0, queue_wait=0.0):
+        self.recorder = recorder
+        self.stage = stage
+        self.file = file
+        self.bytes = bytes
+        self.audio_seconds = audio_seconds
+        self.retries = retries
+        self.queue_wait = queue_wait
+        self.started_at = None
+        self._start = None
+
+    def __enter__(self):
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._start
+        record = {
+            'stage': self.stage,
+            'file': self.file,
+            'started_at': self.started_at,
+            'wall_seconds': wall,
+            'bytes': self.bytes,
+            'audio_seconds': self.audio_seconds,
+            'realtime_factor': self.audio_seconds / wall if self.audio_seconds and wall else None,
+            'mb_per_second': self.bytes / (1024 * 1024) / wall if self.bytes and wall else None,
+            'retries': self.retries,
+            'queue_wait_seconds': self.queue_wait,
+            'error': str(exc) if exc else None,
+        }
+        self.recorder.add(record)
+        return False
+
+
+class MetricsRecorder:
+    """Collects span records and exports them after each batch."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = []
+        self._totals = {}
+
+    def span(self, stage, **attrs):
+        """Return a context manager timing one unit of work in `stage`."""
+        return Span(self, stage, **attrs)
+
+    def add(self, record):
+        """Add a finished span record."""
+        with self._lock:
+            self._records.append(record)
+            totals = self._totals.setdefault(record['stage'], {
+                'count': 0, 'errors': 0, 'wall_seconds': 0.0, 'bytes': 0,
+                'audio_seconds': 0.0, 'retries': 0, 'queue_wait_seconds': 0.0,
+            })
+            totals['count'] += 1
+            totals['errors'] += 1 if record['error'] else 0
+            totals['wall_seconds'] += record['wall_seconds']
+            totals['bytes'] += record['bytes'] or 0
+            totals['audio_seconds'] += record['audio_seconds'] or 0.0
+            totals['retries'] += record['retries'] or 0
+            totals['queue_wait_seconds'] += record['queue_wait_seconds'] or 0.0
+
+    def records(self):
+        """Return the span records that have not been exported yet."""
+        with self._lock:
+            return list(self._records)
+
+    def export(self, jsonl_path, prometheus_path, max_bytes=METRICS_MAX_BYTES,
+               backup_count=METRICS_BACKUP_COUNT):
+        """Append new span records to a JSON-lines file and rewrite the Prometheus file.
+
+        The JSON-lines file is rotated (`<path>.1` to `<path>.<backup_count>`)
+        before it would grow past `max_bytes`. The Prometheus file holds
+        cumulative totals per stage for the life of the process.
+        """
+        with self._lock:
+            records, self._records = self._records, []
+            totals = {stage: dict(values) for stage, values in self._totals.items()}
+
+        if records:
+            data = ''.join(json.dumps(record) + '\n' for record in records)
+            if (os.path.exists(jsonl_path) and os.path.getsize(jsonl_path)
+                    and os.path.getsize(jsonl_path) + len(data.encode('utf-8')) > max_bytes):
+                rotate_file(jsonl_path, backup_count)
+            with open(jsonl_path, 'a', encoding='utf-8') as f:
+                f.write(data)
+
+        lines = []
+        metrics = [
+            ('spans_total', 'counter', 'Number of completed spans', 'count'),
+            ('errors_total', 'counter', 'Number of spans that raised an error', 'errors'),
+            ('wall_seconds_total', 'counter', 'Wall time spent in the stage', 'wall_seconds'),
+            ('bytes_total', 'counter', 'Bytes processed by the stage', 'bytes'),
+            ('audio_seconds_total', 'counter', 'Seconds of audio processed by the stage', 'audio_seconds'),
+            ('retries_total', 'counter', 'Retries performed by the stage', 'retries'),
+            ('queue_wait_seconds_total', 'counter', 'Time work waited before the stage started', 'queue_wait_seconds'),
+        ]
+        for name, metric_type, help_text, key in metrics:
+            lines.append(f"# HELP podcast_uploader_stage_{name} {help_text}")
+            lines.append(f"# TYPE podcast_uploader_stage_{name} {metric_type}")
+            for stage, values in sorted(totals.items()):
+                lines.append(f'podcast_uploader_stage_{name}{{stage="{stage}"}} {values[key]}')
+
+        lines.append("# HELP podcast_uploader_stage_realtime_factor Seconds of audio processed per wall second")
+        lines.append("# TYPE podcast_uploader_stage_realtime_factor gauge")
+        for stage, values in sorted(totals.items()):
+            if values['audio_seconds'] and values['wall_seconds']:
+                lines.append(f'podcast_uploader_stage_realtime_factor{{stage="{stage}"}} '
+                             f"{values['audio_seconds'] / values['wall_seconds']}")
+
+        lines.append("# HELP podcast_uploader_stage_mb_per_second Throughput in megabytes per wall second")
+        lines.append("# TYPE podcast_uploader_stage_mb_per_second gauge")
+        for stage, values in sorted(totals.items()):
+            if values['bytes'] and values['wall_seconds']:
+                lines.append(f'podcast_uploader_stage_mb_per_second{{stage="{stage}"}} '
+                             f"{values['bytes'] / (1024 * 1024) / values['wall_seconds']}")
+
+        # Write to a temporary file first so scrapers never see a partial file
+        temp_path = prometheus_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(temp_path, prometheus_path)
+
+
+_recorder = MetricsRecorder()
+
+
+def get_recorder():
+    """Return the process-wide metrics recorder."""
+    return _recorder
+
+
+@contextmanager
+def profile_run(output_dir):
+    """Profile the enclosed code with cProfile and tracemalloc when opted in.
+
+    Profiling is enabled by setting the PODCAST_UPLOADER_PROFILE environment
+    variable. Results are written to `output_dir` as a .prof file (for pstats or
+    snakeviz) and a text file with the top memory allocation sites.
+    """
+    if not os.environ.get(PROFILE_ENV_VAR):
+        yield
+        return
+
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    profiler = cProfile.Profile()
+    tracemalloc.start(25)
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        profiler.dump_stats(os.path.join(output_dir, f'profile-{stamp}.prof'))
+        with open(os.path.join(output_dir, f'memory-{stamp}.txt'), 'w', encoding='utf-8') as f:
+            f.write(f"Peak traced memory: {peak / (1024 * 1024):.1f} MB\n\n")
+            for stat in snapshot.statistics('lineno')[:50]:
+                f.write(f"{stat}\n")
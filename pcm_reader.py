@@ -0,0 +1,43 @@
+import numpy as np
+
+from wav_info import WAVE_FORMAT_IEEE_FLOAT, read_wav_info
+
+
+def open_pcm(file_path):
+    """Memory-map the PCM data of a WAV file.
+
+    Returns (info, array, scale): `array` has shape (frames, channels) except for
+    24-bit audio, which is (frames, channels, 3) raw bytes; `scale` converts
+    sample values to the range -1..1.
+    """
+    info = read_wav_info(file_path)
+    frame_bytes = info.channels * info.bits_per_sample // 8
+    frames = info.data_size // frame_bytes if frame_bytes else 0
+
+    if info.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        dtype = {32: '<f4', 64: '<f8'}[info.bits_per_sample]
+        scale = 1.0
+    elif info.bits_per_sample == 24:
+        data = np.memmap(file_path, dtype=np.uint8, mode='r', offset=info.data_offset,
+                         shape=(frames, info.channels, 3))
+        return info, data, 1.0 / (1 << 23)
+    else:
+        dtype = {8: 'u1', 16: '<i2', 32: '<i4'}[info.bits_per_sample]
+        scale = 1.0 / (1 << (info.bits_per_sample - 1))
+
+    data = np.memmap(file_path, dtype=dtype, mode='r', offset=info.data_offset,
+                     shape=(frames, info.channels))
+    return info, data, scale
+
+
+def to_mono_float(block, info, scale):
+    """Convert a block of frames from open_pcm to mono float32 in -1..1."""
+    if info.bits_per_sample == 24:
+        samples = (block[..., 0].astype(np.int32)
+                   | (block[..., 1].astype(np.int32) << 8)
+                   | (block[..., 2].astype(np.int8).astype(np.int32) << 16))
+    elif info.bits_per_sample == 8:
+        samples = block.astype(np.int16) - 128
+    else:
+        samples = block
+    return samples.mean(axis=1, dtype=np.float32) * np.float32(scale)
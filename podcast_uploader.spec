@@ -15,6 +15,7 @@ a = Analysis(
         'google.auth.transport.requests',
         'google_auth_oauthlib.flow',
         'google.oauth2.credentials',
+        'google_auth_httplib2',
         'googleapiclient.discovery',
         'tkinter',
         'tkinter.ttk',
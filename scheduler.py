@@ -0,0 +1,157 @@
+import logging
+import os
+import statistics
+import sys
+import time
+from collections import deque, namedtuple
+
+from metrics import read_recent_records
+from wav_info import read_wav_info
+
+logger = logging.getLogger(__name__)
+
+# Encode speed (seconds of audio per wall second) assumed when there is no history
+DEFAULT_REALTIME_FACTOR = 40.0
+# Only the most recent encodes are used, so the estimate follows hardware changes
+HISTORY_SIZE = 500
+# Rough resident memory of one ffmpeg/libmp3lame process, with headroom
+FFMPEG_MEMORY_PER_WORKER = 100 * 1024 * 1024
+# How much of a source file is read to estimate disk throughput
+DISK_SAMPLE_BYTES = 32 * 1024 * 1024
+# Byte rate assumed for files whose header can't be read (16-bit stereo 44.1 kHz)
+FALLBACK_BYTE_RATE = 44100 * 2 * 2
+
+Job = namedtuple('Job', ['source_path', 'audio_seconds', 'byte_rate', 'estimated_seconds'])
+BatchPlan = namedtuple('BatchPlan', ['jobs', 'workers', 'estimated_seconds'])
+
+
+def load_encode_history(metrics_path, limit=HISTORY_SIZE):
+    """Return realtime factors of the most recent successful encodes in a metrics JSON-lines file."""
+    factors = deque(maxlen=limit)
+    if not metrics_path or not os.path.exists(metrics_path):
+        return []
+    try:
+        for record in read_recent_records(metrics_path):
+            if (record.get('stage') == 'encode' and not record.get('error')
+                    and record.get('realtime_factor')):
+                factors.append(record['realtime_factor'])
+    except OSError as e:
+        logger.warning(f"Could not read encode history: {str(e)}")
+    return list(factors)
+
+
+def estimate_realtime_factor(history):
+    """Return the expected encode speed from past realtime factors."""
+    return statistics.median(history) if history else DEFAULT_REALTIME_FACTOR
+
+
+def get_free_memory():
+    """Return available physical memory in bytes, or None if it can't be determined."""
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [
+                    ('dwLength', ctypes.c_ulong),
+                    ('dwMemoryLoad', ctypes.c_ulong),
+                    ('ullTotalPhys', ctypes.c_ulonglong),
+                    ('ullAvailPhys', ctypes.c_ulonglong),
+                    ('ullTotalPageFile', ctypes.c_ulonglong),
+                    ('ullAvailPageFile', ctypes.c_ulonglong),
+                    ('ullTotalVirtual', ctypes.c_ulonglong),
+                    ('ullAvailVirtual', ctypes.c_ulonglong),
+                    ('ullAvailExtendedVirtual', ctypes.c_ulonglong),
+                ]
+
+            status = MEMORYSTATUSEX()
+            status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+            ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+            return status.ullAvailPhys
+        if os.path.exists('/proc/meminfo'):
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    if line.startswith('MemAvailable:'):
+                        return int(line.split()[1]) * 1024
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def measure_read_throughput(file_path, sample_bytes=DISK_SAMPLE_BYTES):
+    """Return the read throughput of the disk holding `file_path` in bytes per second.
+
+    Reads up to `sample_bytes` from the middle of the file, so the header pages
+    that were just parsed (and are likely cached) are skipped.
+    """
+    try:
+        size = os.path.getsize(file_path)
+        with open(file_path, 'rb', buffering=0) as f:
+            f.seek(max(0, size // 2 - sample_bytes // 2))
+            started = time.perf_counter()
+            read = 0
+            while read < sample_bytes:
+                chunk = f.read(min(1024 * 1024, sample_bytes - read))
+                if not chunk:
+                    break
+                read += len(chunk)
+            elapsed = time.perf_counter() - started
+        return read / elapsed if read and elapsed else None
+    except OSError:
+        return None
+
+
+def make_job(source_path, realtime_factor):
+    """Estimate the cost of encoding one file from its WAV header."""
+    try:
+        info = read_wav_info(source_path)
+        audio_seconds = info.duration
+        byte_rate = info.data_size / info.duration if info.duration else FALLBACK_BYTE_RATE
+    except (OSError, ValueError):
+        byte_rate = FALLBACK_BYTE_RATE
+        try:
+            audio_seconds = os.path.getsize(source_path) / byte_rate
+        except OSError:
+            audio_seconds = 0.0
+    return Job(source_path, audio_seconds, byte_rate, audio_seconds / realtime_factor)
+
+
+def estimate_makespan(jobs, workers):
+    """Simulate greedy assignment of jobs (in order) to workers and return the batch's wall time."""
+    finish_times = [0.0] * max(workers, 1)
+    for job in jobs:
+        i = finish_times.index(min(finish_times))
+        finish_times[i] += job.estimated_seconds
+    return max(finish_times)
+
+
+def plan_batch(source_files, metrics_path=None, max_workers=None):
+    """Order a batch longest-processing-time-first and size the worker pool.
+
+    Jobs are sorted by expected encode time, largest first, so a multi-hour file
+    never starts last and leaves the other workers idle. The worker count is the
+    smallest of the CPU count, what free memory allows and what the source disk
+    can feed. libmp3lame encodes on a single thread, so the worker count is
+    the only source of parallelism.
+    """
+    realtime_factor = estimate_realtime_factor(load_encode_history(metrics_path))
+    jobs = sorted((make_job(p, realtime_factor) for p in source_files),
+                  key=lambda job: job.estimated_seconds, reverse=True)
+
+    cores = os.cpu_count() or 1
+    workers = min(cores, max_workers or cores, max(len(jobs), 1))
+
+    free_memory = get_free_memory()
+    if free_memory:
+        workers = min(workers, max(1, free_memory // FFMPEG_MEMORY_PER_WORKER))
+
+    if workers > 1 and jobs:
+        disk_throughput = measure_read_throughput(jobs[0].source_path)
+        # Each encoder reads its source at byte_rate times its realtime factor
+        demand = statistics.mean(job.byte_rate for job in jobs) * realtime_factor
+        if disk_throughput and demand:
+            workers = min(workers, max(1, int(disk_throughput // demand)))
+
+    logger.info(f"Planned {len(jobs)} jobs on {workers} workers "
+                f"(realtime factor {realtime_factor:.1f}x)")
+    return BatchPlan(jobs, workers, estimate_makespan(jobs, workers))
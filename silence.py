@@ -0,0 +1,77 @@
+from collections import namedtuple
+
+import numpy as np
+
+from metrics import get_recorder
+from pcm_reader import open_pcm, to_mono_float
+
+# Windows quieter than this RMS level count as silence
+DEFAULT_THRESHOLD_DB = -50.0
+# RMS is measured over windows of this length
+WINDOW_SECONDS = 0.05
+# Silence kept before the first and after the last audible window
+PADDING_SECONDS = 0.25
+# Don't bother trimming when less than this would be removed at both ends
+MIN_TRIM_SECONDS = 0.5
+# Windows analysed per block; bounds memory use regardless of file length
+BLOCK_WINDOWS = 256
+
+TrimPoints = namedtuple('TrimPoints', ['start', 'end'])
+
+
+def window_levels_db(mono, window):
+    """Return the RMS level in dBFS of each `window`-sample window of a mono signal."""
+    frames = mono[:len(mono) // window * window].reshape(-1, window)
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def find_trim_points(file_path, threshold_db=DEFAULT_THRESHOLD_DB):
+    """Find where the audible part of a WAV file starts and ends.
+
+    The file is memory-mapped and analysed block by block from the head, then
+    from the tail, stopping at the first audible window in each direction, so
+    only the silent parts (plus one block) are ever read and peak memory stays
+    constant.
+
+    Returns:
+        TrimPoints(start, end) in seconds, or None when there is nothing worth
+        trimming (or the whole file is silent)
+    """
+    with get_recorder().span('silence_scan', file=file_path) as span:
+        info, data, scale = open_pcm(file_path)
+        rate = info.sample_rate
+        window = max(1, int(rate * WINDOW_SECONDS))
+        total = len(data) // window * window
+        block = BLOCK_WINDOWS * window
+        frame_bytes = info.channels * info.bits_per_sample // 8
+
+        def audible_windows(start, end):
+            span.bytes += (end - start) * frame_bytes
+            levels = window_levels_db(to_mono_float(data[start:end], info, scale), window)
+            return np.flatnonzero(levels > threshold_db)
+
+        head = None
+        for start in range(0, total, block):
+            loud = audible_windows(start, min(start + block, total))
+            if loud.size:
+                head = start + int(loud[0]) * window
+                break
+        if head is None:
+            return None
+
+        tail = head + window
+        end = total
+        while end > head:
+            start = max(head, end - block)
+            loud = audible_windows(start, end)
+            if loud.size:
+                tail = start + (int(loud[-1]) + 1) * window
+                break
+            end = start
+
+    trim_start = max(0.0, head / rate - PADDING_SECONDS)
+    trim_end = min(info.duration, tail / rate + PADDING_SECONDS)
+    if trim_start < MIN_TRIM_SECONDS and info.duration - trim_end < MIN_TRIM_SECONDS:
+        return None
+    return TrimPoints(trim_start, trim_end)
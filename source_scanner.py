@@ -0,0 +1,198 @@
+import fnmatch
+import json
+import logging
+import os
+import threading
+
+from metrics import get_recorder
+
+logger = logging.getLogger(__name__)
+
+# Symlink policies
+SYMLINKS_IGNORE = 'ignore'   # skip every symlink
+SYMLINKS_FILES = 'files'     # follow symlinked files, don't descend into symlinked folders
+SYMLINKS_FOLLOW = 'follow'   # follow everything, guarding against loops
+
+
+class SourceScanner:
+    """Incremental, streaming scanner for source audio files.
+
+    Walks a folder tree with os.scandir and yields matching files as they are
+    found. Each directory's listing is cached together with its modification
+    time, so a rescan only lists directories whose entries changed; unchanged
+    directories cost a single stat.
+
+    Args:
+        cache_path: JSON file the directory cache is persisted to (None to keep it in memory)
+        extensions: File extensions to match, compared case-insensitively
+        include: Glob patterns a file's path relative to the root must match (any of them)
+        exclude: Glob patterns for files or folders to skip
+        symlinks: One of SYMLINKS_IGNORE, SYMLINKS_FILES or SYMLINKS_FOLLOW
+    """
+
+    def __init__(self, cache_path=None, extensions=('.wav',), include=None, exclude=None,
+                 symlinks=SYMLINKS_FILES):
+        self.cache_path = cache_path
+        self.extensions = tuple(e.lower() for e in extensions)
+        self.set_filters(include, exclude, symlinks)
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.load_cache()
+
+    def set_filters(self, include=None, exclude=None, symlinks=SYMLINKS_FILES):
+        """Change the include/exclude patterns and symlink policy used by later scans."""
+        self.include = [p.lower() for p in (include or [])]
+        self.exclude = [p.lower() for p in (exclude or [])]
+        self.symlinks = symlinks
+
+    def load_cache(self):
+        """Load the directory cache from disk, ignoring a missing or corrupt file."""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                self._cache = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable scan cache: {str(e)}")
+            self._cache = {}
+
+    def save_cache(self):
+        """Write the directory cache to disk atomically."""
+        if not self.cache_path:
+            return
+        with self._lock:
+            data = json.dumps(self._cache)
+        temp_path = self.cache_path + '.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not save scan cache: {str(e)}")
+
+    def is_excluded(self, relative_path):
+        path = relative_path.replace(os.sep, '/').lower()
+        name = path.rsplit('/', 1)[-1]
+        return any(fnmatch.fnmatchcase(path, p) or fnmatch.fnmatchcase(name, p) for p in self.exclude)
+
+    def is_match(self, relative_path):
+        path = relative_path.replace(os.sep, '/').lower()
+        if not path.endswith(self.extensions):
+            return False
+        if self.include and not any(fnmatch.fnmatchcase(path, p) or
+                                    fnmatch.fnmatchcase(path.rsplit('/', 1)[-1], p)
+                                    for p in self.include):
+            return False
+        return not self.is_excluded(relative_path)
+
+    def list_directory(self, path):
+        """Return ([file names], [subdirectory names]) for a directory, using the cache when current."""
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError as e:
+            logger.warning(f"Cannot read {path}: {str(e)}")
+            return [], []
+
+        with self._lock:
+            cached = self._cache.get(path)
+        if cached and cached['mtime'] == mtime and cached.get('symlinks') == self.symlinks:
+            return cached['files'], cached['dirs']
+
+        files, dirs = [], []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        is_link = entry.is_symlink()
+                        if is_link and self.symlinks == SYMLINKS_IGNORE:
+                            continue
+                        if entry.is_dir(follow_symlinks=self.symlinks == SYMLINKS_FOLLOW):
+                            dirs.append(entry.name)
+                        elif entry.is_file(follow_symlinks=True):
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warning(f"Cannot list {path}: {str(e)}")
+            return [], []
+
+        with self._lock:
+            self._cache[path] = {'mtime': mtime, 'symlinks': self.symlinks, 'files': files, 'dirs': dirs}
+        return files, dirs
+
+    def scan(self, root, stop_event=None):
+        """Yield matching files under `root` as they are found.
+
+        Args:
+            root: Folder to scan
+            stop_event: Optional threading.Event; the scan stops soon after it is set
+        """
+        root = os.path.abspath(root)
+        visited = set()
+        pending = [root]
+        while pending:
+            if stop_event is not None and stop_event.is_set():
+                return
+            directory = pending.pop()
+
+            if self.symlinks == SYMLINKS_FOLLOW:
+                # Guard against symlink loops
+                try:
+                    stat = os.stat(directory)
+                except OSError:
+                    continue
+                key = (stat.st_dev, stat.st_ino)
+                if key in visited:
+                    continue
+                visited.add(key)
+
+            files, dirs = self.list_directory(directory)
+            relative_dir = os.path.relpath(directory, root)
+            if relative_dir == os.curdir:
+                relative_dir = ''
+
+            for name in sorted(files):
+                if self.is_match(os.path.join(relative_dir, name)):
+                    yield os.path.join(directory, name)
+
+            # Push in reverse so folders are walked in name order
+            for name in sorted(dirs, reverse=True):
+                if not self.is_excluded(os.path.join(relative_dir, name)):
+                    pending.append(os.path.join(directory, name))
+
+    def scan_in_background(self, root, on_batch, on_done=None, batch_size=200):
+        """Scan `root` on a worker thread, handing files over in batches.
+
+        Args:
+            root: Folder to scan
+            on_batch: Callback(list_of_paths) called from the worker thread
+            on_done: Callback(total_found, stopped) called from the worker thread at the end
+            batch_size: Number of files per on_batch call
+
+        Returns:
+            threading.Event that stops the scan when set
+        """
+        stop_event = threading.Event()
+
+        def worker():
+            found = 0
+            batch = []
+            try:
+                with get_recorder().span('scan', file=root):
+                    for path in self.scan(root, stop_event):
+                        batch.append(path)
+                        found += 1
+                        if len(batch) >= batch_size:
+                            on_batch(batch)
+                            batch = []
+                    if batch:
+                        on_batch(batch)
+            except Exception as e:
+                logger.error(f"Error scanning {root}: {str(e)}")
+            finally:
+                self.save_cache()
+                if on_done:
+                    on_done(found, stop_event.is_set())
+
+        threading.Thread(target=worker, daemon=True).start()
+        return stop_event
@@ -0,0 +1,70 @@
+import struct
+from collections import namedtuple
+
+WavInfo = namedtuple('WavInfo', [
+    'sample_rate',
+    'channels',
+    'bits_per_sample',
+    'format_tag',
+    'data_offset',
+    'data_size',
+    'duration',
+])
+
+# fmt chunk format tags we know how to interpret
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def read_wav_info(file_path):
+    """Read the format and length of a WAV file from its RIFF header.
+
+    Only the chunk headers are read, so this is cheap even for multi-hour files.
+    Unlike the `wave` module it accepts float and WAVE_FORMAT_EXTENSIBLE files.
+    """
+    with open(file_path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] not in (b'RIFF', b'RF64') or header[8:12] != b'WAVE':
+            raise ValueError(f"Not a WAV file: {file_path}")
+
+        fmt = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                break
+            chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+            if chunk_id == b'fmt ':
+                fmt = f.read(chunk_size)
+                if chunk_size % 2:
+                    f.seek(1, 1)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    break
+                if len(fmt) < 16:
+                    raise ValueError(f"WAV file has a truncated fmt chunk: {file_path}")
+                format_tag, channels, sample_rate, byte_rate, block_align, bits = \
+                    struct.unpack('<HHIIHH', fmt[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                    # The real format tag is the first two bytes of the sub-format GUID
+                    format_tag = struct.unpack('<H', fmt[24:26])[0]
+                data_offset = f.tell()
+                # Recorders that crash mid-write leave a zero or oversized data length
+                f.seek(0, 2)
+                available = f.tell() - data_offset
+                data_size = chunk_size if 0 < chunk_size <= available else available
+                duration = data_size / byte_rate if byte_rate else 0.0
+                return WavInfo(sample_rate, channels, bits, format_tag,
+                               data_offset, data_size, duration)
+            else:
+                f.seek(chunk_size + (chunk_size % 2), 1)
+
+    raise ValueError(f"WAV file has no fmt/data chunk: {file_path}")
+
+
+def get_wav_duration(file_path):
+    """Return the duration of a WAV file in seconds, or None if it can't be read."""
+    try:
+        return read_wav_info(file_path).duration
+    except (OSError, ValueError, struct.error):
+        return None
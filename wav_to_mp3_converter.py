@@ -1,30 +1,84 @@
 import os
+import queue
 import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from tkinter.ttk import Progressbar, Style
-from pathlib import Path
-import subprocess
 import shutil
 import logging
-from google_services import GoogleServices
+import sys
+import time
+from google_services import DriveBatch, GoogleServices, season_folder_name
+from drive_folder_browser import DriveFolderBrowser
+from logging_config import configure_logging
+from encoder import EncodingProfile, convert_batch
+from estimator import estimate_batch, format_estimate, record_actuals
+from episode_metadata import COVER_EXTENSIONS, match_tags, parse_metadata_rows
+from fingerprint import FingerprintIndex
+from scheduler import plan_batch
+from source_scanner import SourceScanner, SYMLINKS_FILES, SYMLINKS_FOLLOW, SYMLINKS_IGNORE
+from job_journal import JobJournal, STAGE_UPLOADED, STAGE_POST_PROCESSED, STAGE_DOCUMENTED
+from loudness import DEFAULT_TARGET_LUFS, LoudnessCache
+from metrics import get_recorder, profile_run
 from datetime import datetime
+from collections import namedtuple
+
+# Symlink policies offered for folder scans, by their label in the UI
+SYMLINK_OPTIONS = {
+    "Follow linked files": SYMLINKS_FILES,
+    "Follow linked files and folders": SYMLINKS_FOLLOW,
+    "Ignore links": SYMLINKS_IGNORE,
+}
+
+
+# Conversion options read from the UI on the Tk thread and handed to the conversion thread
+ConversionSettings = namedtuple('ConversionSettings', [
+    'source_files', 'output_dir', 'trim_silence', 'loudness_target',
+    'tag_from_sheet', 'spreadsheet_id', 'sheet_name', 'cover_path',
+])
+
+
+def split_patterns(text):
+    """Split a ;-separated list of glob patterns, dropping blanks."""
+    return [pattern.strip() for pattern in text.split(';') if pattern.strip()]
+
+
+def get_app_dir():
+    """Return the directory where logs, the job journal and metrics are kept."""
+    return os.path.dirname(os.path.abspath(__file__))
 
 # Set up logging
 def setup_logging():
-    log_dir = os.path.dirname(os.path.abspath(__file__))
-    log_file = os.path.join(log_dir, 'podcast_uploader.log')
-    
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ]
-    )
+    configure_logging(get_app_dir())
     return logging.getLogger(__name__)
 
+def get_journal_path():
+    """Return the path of the job journal database, kept next to the log file."""
+    return os.path.join(get_app_dir(), 'podcast_uploader_jobs.db')
+
+def get_fingerprint_index_path():
+    """Return the path of the source fingerprint index database."""
+    return os.path.join(get_app_dir(), 'podcast_uploader_fingerprints.db')
+
+def get_scan_cache_path():
+    """Return the path of the source folder scan cache."""
+    return os.path.join(get_app_dir(), 'podcast_uploader_scan_cache.json')
+
+def get_metrics_path():
+    """Return the path of the JSON-lines metrics history."""
+    return os.path.join(get_app_dir(), 'podcast_uploader_metrics.jsonl')
+
+def get_estimates_path():
+    """Return the path of the JSON-lines history of batch estimates and actuals."""
+    return os.path.join(get_app_dir(), 'podcast_uploader_estimates.jsonl')
+
+def export_metrics():
+    """Write the metrics collected during the last batch next to the log file."""
+    get_recorder().export(
+        get_metrics_path(),
+        os.path.join(get_app_dir(), 'podcast_uploader_metrics.prom')
+    )
+
 class ModernConverter:
     def __init__(self):
         try:
@@ -54,22 +108,41 @@ class ModernConverter:
                                thickness=15)
 
             self.source_files = []
+            self.scanner = SourceScanner(cache_path=get_scan_cache_path())
+            self.scan_stop = None  # Stops the folder scan in progress
+            self.scan_queue = None  # Batches of files found by the folder scan
+            # Folder scan filters: ;-separated glob patterns and the symlink policy
+            self.include_var = tk.StringVar()
+            self.exclude_var = tk.StringVar()
+            self.symlinks_var = tk.StringVar(value=next(iter(SYMLINK_OPTIONS)))
             self.output_var = tk.StringVar()
             self.conversion_progress_var = tk.DoubleVar()
             self.upload_progress_var = tk.DoubleVar()
             self.current_file_var = tk.StringVar(value="Ready to convert...")
-            
-            # Google Drive folders
-            self.google_drive_folder = tk.StringVar()
-            self.folders_list = []
+            self.trim_silence_var = tk.BooleanVar(value=False)
+            self.normalize_loudness_var = tk.BooleanVar(value=False)
+            # Per-file Drive post-processing, applied in batches after the uploads
+            self.share_link_var = tk.BooleanVar(value=False)
+            self.season_folders_var = tk.BooleanVar(value=False)
+            self.describe_uploads_var = tk.BooleanVar(value=False)
+            # ID3 tags from the selected sheet and cover art, written during the encode
+            self.tag_from_sheet_var = tk.BooleanVar(value=False)
+            self.cover_path = None
             
             # Google Sheets
             self.spreadsheet_id = tk.StringVar()
             self.sheet_range = tk.StringVar(value="Sheet1!A:A")  # Default range
+
+            # Durable per-file progress so interrupted batches can be resumed
+            self.journal = JobJournal(get_journal_path())
+            # Spectral fingerprints of earlier sources, used to spot duplicate recordings
+            self.fingerprints = FingerprintIndex(get_fingerprint_index_path())
+            # First-pass loudness measurements live alongside the journal, keyed by content hash
+            self.loudness_cache = LoudnessCache(get_journal_path())
             
+            self.google_services = None
             try:
                 self.google_services = GoogleServices()
-                self.folders_list = self.google_services.get_folder_list()
                 self.logger.info("Google Services initialized successfully")
             except Exception as e:
                 self.logger.error(f"Failed to initialize Google Services: {str(e)}")
@@ -129,6 +202,38 @@ class ModernConverter:
                                             padx=15)
         self.browse_folder_button.pack(side="left")
 
+        # Filters applied when a folder is scanned
+        filter_frame = tk.Frame(source_frame, bg="#f0f0f0")
+        filter_frame.pack(fill="x", pady=(5, 0))
+
+        tk.Label(filter_frame,
+                text="Include:",
+                bg="#f0f0f0",
+                font=("Segoe UI", 10)).pack(side="left")
+        self.include_entry = tk.Entry(filter_frame,
+                                      textvariable=self.include_var,
+                                      width=16,
+                                      font=("Segoe UI", 10))
+        self.include_entry.pack(side="left", padx=(5, 10))
+
+        tk.Label(filter_frame,
+                text="Exclude:",
+                bg="#f0f0f0",
+                font=("Segoe UI", 10)).pack(side="left")
+        self.exclude_entry = tk.Entry(filter_frame,
+                                      textvariable=self.exclude_var,
+                                      width=16,
+                                      font=("Segoe UI", 10))
+        self.exclude_entry.pack(side="left", padx=(5, 10))
+
+        self.symlinks_combobox = ttk.Combobox(filter_frame,
+                                              textvariable=self.symlinks_var,
+                                              values=list(SYMLINK_OPTIONS),
+                                              state="readonly",
+                                              width=28,
+                                              font=("Segoe UI", 10))
+        self.symlinks_combobox.pack(side="left")
+
         # Output selection
         output_frame = tk.Frame(main_frame, bg="#f0f0f0")
         output_frame.pack(fill="x", pady=10)
@@ -158,12 +263,10 @@ class ModernConverter:
                 bg="#f0f0f0",
                 font=("Segoe UI", 10)).pack(side="top", anchor="w")
 
-        self.folder_combobox = ttk.Combobox(drive_frame,
-                                          textvariable=self.google_drive_folder,
-                                          values=[f"{f.get('name')} ({f.get('id')})" for f in self.folders_list],
-                                          state="readonly",
-                                          font=("Segoe UI", 10))
-        self.folder_combobox.pack(fill="x", pady=(5, 0))
+        # The browser fetches on its own thread, so it gets its own API transports
+        browser_services = self.google_services.clone() if self.google_services else None
+        self.folder_browser = DriveFolderBrowser(drive_frame, browser_services, height=6, bg="#f0f0f0")
+        self.folder_browser.pack(fill="x", pady=(5, 0))
 
         # Google Sheets configuration
         sheets_frame = tk.Frame(main_frame, bg="#f0f0f0")
@@ -204,6 +307,86 @@ class ModernConverter:
         self.sheet_combobox.pack(fill="x", pady=(5, 0))
         self.sheet_combobox.bind('<<ComboboxSelected>>', self.on_sheet_selected)
 
+        # Encoding options
+        options_frame = tk.Frame(main_frame, bg="#f0f0f0")
+        options_frame.pack(fill="x", pady=(10, 0))
+
+        self.trim_silence_check = tk.Checkbutton(options_frame,
+                                                 text="Trim leading and trailing silence",
+                                                 variable=self.trim_silence_var,
+                                                 bg="#f0f0f0",
+                                                 font=("Segoe UI", 10))
+        self.trim_silence_check.pack(side="left")
+
+        self.normalize_loudness_check = tk.Checkbutton(options_frame,
+                                                       text=f"Normalise loudness to {DEFAULT_TARGET_LUFS:g} LUFS",
+                                                       variable=self.normalize_loudness_var,
+                                                       bg="#f0f0f0",
+                                                       font=("Segoe UI", 10))
+        self.normalize_loudness_check.pack(side="left", padx=(20, 0))
+
+        # ID3 tagging options
+        tagging_frame = tk.Frame(main_frame, bg="#f0f0f0")
+        tagging_frame.pack(fill="x")
+
+        self.tag_from_sheet_check = tk.Checkbutton(tagging_frame,
+                                                   text="Write ID3 tags from the selected sheet",
+                                                   variable=self.tag_from_sheet_var,
+                                                   bg="#f0f0f0",
+                                                   font=("Segoe UI", 10))
+        self.tag_from_sheet_check.pack(side="left")
+
+        self.browse_cover_button = tk.Button(tagging_frame,
+                                             text="Select Cover Art",
+                                             command=self.select_cover_art,
+                                             bg="#2196F3",
+                                             fg="white",
+                                             font=("Segoe UI", 10),
+                                             relief="flat",
+                                             padx=15)
+        self.browse_cover_button.pack(side="left", padx=(20, 10))
+
+        self.cover_label = tk.Label(tagging_frame,
+                                    text="No cover art",
+                                    bg="#f0f0f0",
+                                    font=("Segoe UI", 10))
+        self.cover_label.pack(side="left")
+
+        self.clear_cover_button = tk.Button(tagging_frame,
+                                            text="Clear",
+                                            command=self.clear_cover_art,
+                                            bg="#2196F3",
+                                            fg="white",
+                                            font=("Segoe UI", 10),
+                                            relief="flat",
+                                            padx=15)
+        self.clear_cover_button.pack(side="left", padx=(10, 0))
+
+        # Drive post-processing options
+        drive_options_frame = tk.Frame(main_frame, bg="#f0f0f0")
+        drive_options_frame.pack(fill="x")
+
+        self.share_link_check = tk.Checkbutton(drive_options_frame,
+                                               text="Share via link",
+                                               variable=self.share_link_var,
+                                               bg="#f0f0f0",
+                                               font=("Segoe UI", 10))
+        self.share_link_check.pack(side="left")
+
+        self.season_folders_check = tk.Checkbutton(drive_options_frame,
+                                                   text="Per-season subfolders",
+                                                   variable=self.season_folders_var,
+                                                   bg="#f0f0f0",
+                                                   font=("Segoe UI", 10))
+        self.season_folders_check.pack(side="left", padx=(20, 0))
+
+        self.describe_uploads_check = tk.Checkbutton(drive_options_frame,
+                                                     text="Add source details to Drive files",
+                                                     variable=self.describe_uploads_var,
+                                                     bg="#f0f0f0",
+                                                     font=("Segoe UI", 10))
+        self.describe_uploads_check.pack(side="left", padx=(20, 0))
+
         # Buttons frame
         buttons_frame = tk.Frame(main_frame, bg="#f0f0f0")
         buttons_frame.pack(pady=10)
@@ -309,17 +492,65 @@ class ModernConverter:
     def select_source_folder(self):
         folder_path = filedialog.askdirectory(title="Select Folder with WAV Files")
         if folder_path:
-            self.source_files = [str(p) for p in Path(folder_path).glob("**/*.wav")]
+            # Stop any scan still running for a previously selected folder
+            if self.scan_stop:
+                self.scan_stop.set()
+            self.source_files = []
+            self.scanner.set_filters(split_patterns(self.include_var.get()),
+                                     split_patterns(self.exclude_var.get()),
+                                     SYMLINK_OPTIONS[self.symlinks_var.get()])
+            self.scan_queue = scan_queue = queue.Queue()
+            self.convert_button.config(state=tk.DISABLED)
+            self.source_label.config(text="Scanning folder...")
+
+            # Walk the folder on a worker thread; the Tk thread picks up results in poll_scan
+            self.scan_stop = self.scanner.scan_in_background(
+                folder_path,
+                on_batch=lambda batch: scan_queue.put(('batch', batch)),
+                on_done=lambda found, stopped: scan_queue.put(('done', found))
+            )
+            self.root.after(100, self.poll_scan, scan_queue)
+
+    def poll_scan(self, scan_queue):
+        """Move files found by the background scan into the source list."""
+        if scan_queue is not self.scan_queue:
+            return  # A newer folder selection replaced this scan
+
+        done = False
+        while True:
+            try:
+                kind, payload = scan_queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'batch':
+                self.source_files.extend(payload)
+            else:
+                done = True
+
+        if done:
+            self.scan_stop = None
+            self.scan_queue = None
             self.update_source_label()
+            self.convert_button.config(state=tk.NORMAL)
+        else:
+            self.source_label.config(text=f"Scanning folder... found {len(self.source_files)} WAV files")
+            self.root.after(100, self.poll_scan, scan_queue)
 
     def select_source_files(self):
+        # Stop any folder scan so it doesn't add files to this selection; its partial results are dropped
+        if self.scan_stop:
+            self.scan_stop.set()
+            self.scan_stop = None
+            self.scan_queue = None
+            self.source_files = []
         file_paths = filedialog.askopenfilenames(
             title="Select WAV Files",
-            filetypes=[("WAV files", "*.wav")]
+            filetypes=[("WAV files", "*.wav *.WAV")]
         )
         if file_paths:
             self.source_files = list(file_paths)
-            self.update_source_label()
+            self.convert_button.config(state=tk.NORMAL)
+        self.update_source_label()
 
     def update_source_label(self):
         if self.source_files:
@@ -333,58 +564,212 @@ class ModernConverter:
             self.output_var.set(folder_path)
             self.output_label.config(text=f"Output: {folder_path}")
 
+    def select_cover_art(self):
+        file_path = filedialog.askopenfilename(
+            title="Select Cover Art",
+            filetypes=[("Images", " ".join(f"*{ext}" for ext in COVER_EXTENSIONS))]
+        )
+        # Cancelling the dialog keeps the current cover
+        if file_path:
+            self.cover_path = file_path
+            self.cover_label.config(text=os.path.basename(file_path))
+
+    def clear_cover_art(self):
+        self.cover_path = None
+        self.cover_label.config(text="No cover art")
+
+    def load_episode_tags(self, source_files, spreadsheet_id, sheet_name):
+        """Bulk-read a sheet once and return ID3 tags for each source file that has a row."""
+        rows = self.google_services.get_sheet_values(spreadsheet_id, sheet_name)
+        tags = match_tags(parse_metadata_rows(rows), source_files)
+        self.logger.info(f"Found episode metadata for {len(tags)} of {len(source_files)} files")
+        return tags
+
     def get_selected_folder_id(self):
-        selected = self.folder_combobox.get()
-        if selected:
-            folder_id = selected.split('(')[-1].rstrip(')')
-            return folder_id
-        return None
-
-    def convert_files(self):
-        """Convert WAV files to MP3."""
-        total_files = len(self.source_files)
-        self.converted_files = []  # Store converted file paths
-        
-        for index, file_path in enumerate(self.source_files, 1):
+        return self.folder_browser.selected_folder_id()
+
+    def queue_post_processing(self, batch, file_id, file_name, source_path):
+        """Queue the selected Drive post-processing calls for an uploaded file."""
+        if self.share_link_var.get():
+            batch.share_with_link(file_id, key=file_name)
+        if self.describe_uploads_var.get():
+            source_name = os.path.basename(source_path) if source_path else file_name
+            # appProperties keys and values are limited to 124 bytes together
+            properties = {'sourceFile': source_name.encode('utf-8')[:100].decode('utf-8', 'ignore')}
+            job = self.journal.get(source_path) if source_path else None
+            if job and job['content_hash']:
+                properties['sourceSha256'] = job['content_hash']
+            batch.update_file(file_id, key=file_name,
+                              description=f"Converted from {source_name} on {datetime.now():%Y-%m-%d}",
+                              appProperties=properties)
+
+    def apply_post_processing(self, batch):
+        """Send queued Drive post-processing calls and report any that failed.
+
+        Returns the keys of the calls that failed, or None if the batch could not be sent.
+        """
+        try:
+            self.current_file_var.set("Updating Drive file settings...")
+            failed = [result for result in batch.flush() if result.error]
+        except Exception as e:
+            self.logger.error(f"Error updating Drive file settings: {str(e)}")
+            messagebox.showerror("Error", f"Error updating Drive file settings: {str(e)}")
+            return None
+        for result in failed:
+            self.logger.error(f"Drive settings for {result.key} failed: {result.error}")
+        if failed:
+            details = "\n".join(f"{result.key}: {result.error}" for result in failed[:10])
+            messagebox.showwarning("Warning", f"Some Drive settings could not be applied:\n\n{details}")
+        return {result.key for result in failed}
+
+    def convert_files(self, events, settings):
+        """Convert WAV files to MP3.
+
+        Runs off the Tk thread, and convert_batch calls back from its worker
+        threads, so progress, errors and questions for the user are put on
+        `events` for poll_conversion.
+        """
+        completed = False
+        try:
+            completed = self.run_conversion(events, settings)
+        except Exception as e:
+            self.logger.error(f"Error during conversion: {str(e)}")
+            events.put(('error', f"Error during conversion: {str(e)}"))
+        finally:
+            events.put(('done', completed))
+
+    def ask(self, events, question):
+        """Run `question` (a dialog) on the Tk thread and wait for its answer."""
+        reply = queue.Queue(maxsize=1)
+        events.put(('ask', (question, reply)))
+        return reply.get()
+
+    def run_conversion(self, events, settings):
+        """Convert the selected files; return False if the user cancelled."""
+        def on_file_start(index, total_files, file_path):
+            file_name = os.path.basename(file_path)
+            events.put(('status', f"Converting: {file_name} ({index}/{total_files})"))
+
+        def on_error(file_path, e):
+            events.put(('error', f"Error converting {file_path}: {str(e)}"))
+
+        # Flag duplicate recordings before any encode or upload work is spent on them
+        source_files = settings.source_files
+        events.put(('status', "Checking for duplicate recordings..."))
+        try:
+            duplicates = self.fingerprints.find_duplicates(source_files)
+        except Exception as e:
+            self.logger.error(f"Error checking for duplicate recordings: {str(e)}")
+            duplicates = {}
+        if duplicates and self.ask(events, lambda: self.handle_duplicate_files(duplicates)):
+            source_files = [p for p in source_files if p not in duplicates]
+
+        # Order jobs largest-first and size the worker pool from past encode speed
+        plan = plan_batch(source_files, get_metrics_path())
+        profile = EncodingProfile(
+            trim_silence=settings.trim_silence,
+            loudness_target=settings.loudness_target
+        )
+
+        tags = {}
+        if settings.tag_from_sheet:
+            events.put(('status', "Reading episode metadata..."))
             try:
-                # Update current file label
-                file_name = os.path.basename(file_path)
-                self.current_file_var.set(f"Converting: {file_name} ({index}/{total_files})")
-                
-                # Get the filename without extension
-                filename = os.path.splitext(os.path.basename(file_path))[0]
-                output_file = os.path.join(self.output_var.get(), f"{filename}.mp3")
+                tags = self.load_episode_tags(source_files, settings.spreadsheet_id, settings.sheet_name)
+            except Exception as e:
+                self.logger.error(f"Error reading episode metadata: {str(e)}")
+                events.put(('error', f"Error reading episode metadata: {str(e)}\nFiles will be converted without tags."))
+        cover_path = settings.cover_path if settings.cover_path and os.path.exists(settings.cover_path) else None
 
-                # FFmpeg command with better quality settings
-                try:
-                    result = subprocess.run(
-                        ['ffmpeg', '-y', '-i', file_path, 
-                         '-codec:a', 'libmp3lame', '-qscale:a', '2',
-                         output_file],
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True,
-                        check=True
-                    )
-                except subprocess.CalledProcessError as e:
-                    raise Exception(f"FFmpeg error: {e.stderr}")
+        # Show what the batch is expected to cost before any work starts
+        self.batch_estimate = None
+        try:
+            estimate = estimate_batch(plan, profile, settings.output_dir, self.journal,
+                                      get_metrics_path(), get_estimates_path(), tags, cover_path)
+        except Exception as e:
+            self.logger.error(f"Error estimating batch: {str(e)}")
+            estimate = None
+        if estimate:
+            message = f"{format_estimate(estimate)}\n\nStart conversion?"
+            if not self.ask(events, lambda: messagebox.askokcancel("Batch Estimate", message)):
+                events.put(('status', "Conversion cancelled."))
+                return False
+            self.batch_estimate = estimate
+
+        encode_started = time.perf_counter()
+        converted = convert_batch(
+            source_files,
+            settings.output_dir,
+            journal=self.journal,
+            plan=plan,
+            profile=profile,
+            loudness_cache=self.loudness_cache,
+            tags=tags,
+            cover_path=cover_path,
+            on_file_start=on_file_start,
+            on_progress=lambda value: events.put(('progress', value)),
+            on_error=on_error
+        )
+        self.converted_files = [output_file for _, output_file in converted]  # Store converted file paths
+        # Map converted file paths back to their sources
+        self.converted_sources = {output_file: file_path for file_path, output_file in converted}
 
-                self.converted_files.append(output_file)
-                # Update progress
-                progress = (index / total_files) * 100
-                self.update_conversion_progress(progress)
+        # Only complete batches are compared with the estimate; failed files would skew it
+        if self.batch_estimate and len(converted) == len(plan.jobs):
+            record_actuals(get_estimates_path(), self.batch_estimate,
+                           encode_seconds=time.perf_counter() - encode_started,
+                           output_bytes=sum(os.path.getsize(output_file) for _, output_file in converted))
 
-            except Exception as e:
-                self.logger.error(f"Error converting {file_path}: {str(e)}")
-                messagebox.showerror("Error", f"Error converting {file_path}: {str(e)}")
+        try:
+            export_metrics()
+        except Exception as e:
+            self.logger.error(f"Error exporting metrics: {str(e)}")
+        return True
 
-        self.current_file_var.set("Conversion complete!")
-        messagebox.showinfo("Success", "All files have been converted!")
+    def poll_conversion(self, events):
+        """Apply conversion progress on the Tk thread until the batch is done."""
+        done = completed = False
+        while True:
+            try:
+                kind, payload = events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'status':
+                self.current_file_var.set(payload)
+            elif kind == 'progress':
+                self.update_conversion_progress(payload)
+            elif kind == 'error':
+                messagebox.showerror("Error", payload)
+            elif kind == 'ask':
+                # The conversion thread waits for the answer
+                question, reply = payload
+                reply.put(question())
+            else:
+                done, completed = True, payload
+
+        # Polling resumes only after any dialog above has closed
+        if not done:
+            self.root.after(100, self.poll_conversion, events)
+            return
         self.enable_buttons()
-        self.upload_button.config(state=tk.NORMAL)  # Enable upload button
+        if completed:
+            self.current_file_var.set("Conversion complete!")
+            messagebox.showinfo("Success", "All files have been converted!")
+            self.upload_button.config(state=tk.NORMAL)  # Enable upload button
 
     def upload_files(self):
         """Upload MP3 files to Google Drive and update sheets."""
+        try:
+            self.run_upload()
+        finally:
+            # Export even when the upload stops early, so failed batches are measured too
+            try:
+                export_metrics()
+            except Exception as e:
+                self.logger.error(f"Error exporting metrics: {str(e)}")
+
+    def run_upload(self):
+        """Upload the converted files, apply Drive post-processing and document them in the sheet."""
         if not hasattr(self, 'converted_files') or not self.converted_files:
             self.logger.error("No converted files found. Please convert files first.")
             messagebox.showerror("Error", "No converted files found. Please convert files first.")
@@ -402,15 +787,56 @@ class ModernConverter:
 
         total_files = len(self.converted_files)
         uploaded_files = []
-        
+        uploaded_sources = {}  # Map sheet filenames back to their source files
+        folder_id = self.get_selected_folder_id()
+        # Upload actuals are recorded once per estimate, from the first upload of the batch
+        batch_estimate, self.batch_estimate = getattr(self, 'batch_estimate', None), None
+        spreadsheet_id = self.spreadsheet_id.get()
+        sheet_range = self.sheet_range.get()
+        upload_started = time.perf_counter()
+        upload_failed = False
+
+        # Create any missing season subfolders up front so files upload straight into them
+        season_folders = {}
+        if self.season_folders_var.get():
+            seasons = {season_folder_name(os.path.basename(p)) for p in self.converted_files} - {None}
+            if seasons:
+                try:
+                    self.current_file_var.set("Creating season folders...")
+                    season_folders = self.google_services.ensure_subfolders(folder_id, seasons)
+                except Exception as e:
+                    self.logger.error(f"Error creating season folders: {str(e)}")
+                    messagebox.showerror("Error", f"Error creating season folders: {str(e)}\nFiles will be uploaded to the selected folder.")
+
+        # Permission and metadata calls are queued here and sent through Drive's batch endpoint
+        post_processing = DriveBatch(self.google_services.drive_service)
+        post_processing_sources = {}  # Map batch keys back to their source files
+
         for index, file_path in enumerate(self.converted_files, 1):
             try:
                 # Get filename for display
                 file_name = os.path.basename(file_path)
                 self.current_file_var.set(f"Uploading: {file_name} ({index}/{total_files})")
+                filename = os.path.splitext(os.path.basename(file_path))[0]
+                source_path = self.converted_sources.get(file_path)
+
+                # Reuse earlier uploads to the same folder recorded in the journal instead of creating duplicates
+                job = self.journal.reached(source_path, STAGE_UPLOADED) if source_path else None
+                if (job and job['output_path'] == file_path and job['drive_file_id']
+                        and job['drive_folder_id'] == folder_id):
+                    self.logger.info(f"Skipping upload of {file_name}: already on Drive")
+                    self.update_upload_progress((index / total_files) * 100, file_name)
+                    if not self.journal.reached(source_path, STAGE_POST_PROCESSED):
+                        # Uploaded by an earlier run whose Drive settings never went through
+                        self.queue_post_processing(post_processing, job['drive_file_id'], file_name, source_path)
+                        post_processing_sources[file_name] = source_path
+                    if not (job['stage'] == STAGE_DOCUMENTED and job['spreadsheet_id'] == spreadsheet_id
+                            and job['sheet_range'] == sheet_range):
+                        uploaded_files.append([filename, job['web_link']])
+                        uploaded_sources[filename] = source_path
+                    continue
 
                 # Upload to Google Drive with progress tracking
-                folder_id = self.get_selected_folder_id()
                 if folder_id:
                     def update_single_file_progress(progress):
                         # Calculate overall progress
@@ -419,35 +845,72 @@ class ModernConverter:
                     
                     file_id, web_link = self.google_services.upload_to_drive(
                         file_path, 
-                        folder_id,
+                        season_folders.get(season_folder_name(file_name), folder_id),
                         progress_callback=update_single_file_progress
                     )
-                    
-                    filename = os.path.splitext(os.path.basename(file_path))[0]
+
+                    # Journal the upload before anything else can fail, so the next run doesn't duplicate it
+                    if source_path:
+                        self.journal.record(source_path, STAGE_UPLOADED, durable=True,
+                                            drive_file_id=file_id,
+                                            drive_folder_id=folder_id,
+                                            web_link=web_link)
+                        uploaded_sources[filename] = source_path
                     uploaded_files.append([filename, web_link])
 
+                    self.queue_post_processing(post_processing, file_id, file_name, source_path)
+                    if source_path:
+                        post_processing_sources[file_name] = source_path
+
             except Exception as e:
+                upload_failed = True
                 self.logger.error(f"Error uploading {file_path}: {str(e)}")
                 messagebox.showerror("Error", f"Error uploading {file_path}: {str(e)}")
 
+        upload_seconds = time.perf_counter() - upload_started
+        failed_post_processing = self.apply_post_processing(post_processing)
+        if failed_post_processing is not None:
+            for file_name, source_path in post_processing_sources.items():
+                if file_name not in failed_post_processing:
+                    self.journal.record(source_path, STAGE_POST_PROCESSED)
+            try:
+                self.journal.flush()
+            except Exception as e:
+                self.logger.error(f"Error writing job journal: {str(e)}")
+
         # Update Google Sheets
         if uploaded_files:
             try:
                 self.current_file_var.set("Updating Google Sheets...")
-                print(f"Updating sheet with ID: {self.spreadsheet_id.get()}")
-                print(f"Range: {self.sheet_range.get()}")
-                print(f"Files: {uploaded_files}")
+                self.logger.info(f"Updating sheet with ID: {self.spreadsheet_id.get()}")
+                self.logger.info(f"Range: {self.sheet_range.get()}")
+                self.logger.debug(f"Files: {uploaded_files}")
                 
-                self.google_services.update_spreadsheet(
-                    self.spreadsheet_id.get(),
-                    self.sheet_range.get(),
+                sheet_rows = self.google_services.update_spreadsheet(
+                    spreadsheet_id,
+                    sheet_range,
                     uploaded_files,
                     self.handle_unmatched_files
                 )
+                for filename, row in sheet_rows.items():
+                    # Files whose Drive settings failed stay at the upload stage so the next run retries them
+                    if filename in uploaded_sources and self.journal.reached(uploaded_sources[filename],
+                                                                             STAGE_POST_PROCESSED):
+                        self.journal.record(uploaded_sources[filename], STAGE_DOCUMENTED,
+                                            spreadsheet_id=spreadsheet_id,
+                                            sheet_range=sheet_range,
+                                            sheet_row=row)
+                self.journal.flush()
             except Exception as e:
                 self.logger.error(f"Error updating Google Sheets: {str(e)}")
                 messagebox.showerror("Error", f"Error updating Google Sheets: {str(e)}\nSpreadsheet ID: {self.spreadsheet_id.get()}\nRange: {self.sheet_range.get()}")
                 return
+            finally:
+                sheets_calls = sum(1 for record in get_recorder().records()
+                                   if record['stage'] in ('sheets_read', 'sheets_write'))
+                if batch_estimate and not upload_failed:
+                    record_actuals(get_estimates_path(), batch_estimate,
+                                   upload_seconds=upload_seconds, sheets_calls=sheets_calls)
 
         self.current_file_var.set("Upload complete!")
         messagebox.showinfo("Success", "All files have been uploaded and documented!")
@@ -465,6 +928,11 @@ class ModernConverter:
             messagebox.showerror("Error", "Please select an output folder.")
             return
 
+        if self.tag_from_sheet_var.get() and not (self.google_services and self.sheet_combobox.get()):
+            self.logger.error("Please select a Google Sheet and sheet/tab to read tags from.")
+            messagebox.showerror("Error", "Please select a Google Sheet and sheet/tab to read tags from.")
+            return
+
         # Reset progress bars
         self.update_conversion_progress(0)
         self.update_upload_progress(0)
@@ -474,8 +942,22 @@ class ModernConverter:
         
         self.current_file_var.set("Starting conversion...")
 
-        # Run the conversion in a separate thread
-        threading.Thread(target=self.convert_files, daemon=True).start()
+        # Tk variables are only read here, on the Tk thread
+        settings = ConversionSettings(
+            source_files=list(self.source_files),
+            output_dir=self.output_var.get(),
+            trim_silence=self.trim_silence_var.get(),
+            loudness_target=DEFAULT_TARGET_LUFS if self.normalize_loudness_var.get() else None,
+            tag_from_sheet=self.tag_from_sheet_var.get(),
+            spreadsheet_id=self.spreadsheet_id.get(),
+            sheet_name=self.sheet_combobox.get(),
+            cover_path=self.cover_path,
+        )
+
+        # Run the conversion in a separate thread; poll_conversion shows its progress
+        events = queue.Queue()
+        threading.Thread(target=self.convert_files, args=(events, settings), daemon=True).start()
+        self.root.after(100, self.poll_conversion, events)
 
     def start_upload(self):
         """Start the upload process."""
@@ -508,18 +990,24 @@ class ModernConverter:
     def disable_buttons(self):
         """Disable all buttons during processing."""
         for btn in [self.convert_button, self.upload_button, self.browse_files_button, 
-                   self.browse_folder_button, self.browse_output_button]:
+                   self.browse_folder_button, self.browse_output_button, self.trim_silence_check,
+                   self.normalize_loudness_check, self.share_link_check, self.season_folders_check,
+                   self.describe_uploads_check, self.tag_from_sheet_check, self.browse_cover_button,
+                   self.clear_cover_button]:
             btn.config(state=tk.DISABLED)
-        self.folder_combobox.config(state="disabled")
+        self.folder_browser.set_enabled(False)
         self.spreadsheet_combobox.config(state="disabled")
         self.sheet_combobox.config(state="disabled")
 
     def enable_buttons(self):
         """Enable all buttons after processing."""
         for btn in [self.convert_button, self.browse_files_button, 
-                   self.browse_folder_button, self.browse_output_button]:
+                   self.browse_folder_button, self.browse_output_button, self.trim_silence_check,
+                   self.normalize_loudness_check, self.share_link_check, self.season_folders_check,
+                   self.describe_uploads_check, self.tag_from_sheet_check, self.browse_cover_button,
+                   self.clear_cover_button]:
             btn.config(state=tk.NORMAL)
-        self.folder_combobox.config(state="readonly")
+        self.folder_browser.set_enabled(True)
         self.spreadsheet_combobox.config(state="readonly")
         self.sheet_combobox.config(state="readonly")
         # Note: upload_button state is managed separately
@@ -577,6 +1065,23 @@ class ModernConverter:
         
         return response
 
+    def handle_duplicate_files(self, duplicates):
+        """Show dialog for duplicate recordings and return whether to skip them."""
+        if not duplicates:
+            return False
+
+        lines = [f"{os.path.basename(duplicate)}  =  {os.path.basename(original)}"
+                 for duplicate, original in duplicates.items()]
+        message = "The following recordings appear to duplicate another recording:\n\n"
+        message += "\n".join(lines)
+        message += "\n\nWould you like to skip the duplicates?"
+
+        return messagebox.askyesno(
+            "Duplicate Recordings Found",
+            message,
+            icon='warning'
+        )
+
     def run(self):
         self.root.mainloop()
 
@@ -666,8 +1171,9 @@ def main():
             sys.exit(0)
         
         # If authentication is successful, proceed with main application
-        app = ModernConverter()
-        app.run()
+        with profile_run(get_app_dir()):
+            app = ModernConverter()
+            app.run()
     except Exception as e:
         logging.error(f"Critical error: {str(e)}", exc_info=True)
         messagebox.showerror("Critical Error", 